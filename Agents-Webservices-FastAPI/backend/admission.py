@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import math
+from contextlib import asynccontextmanager
+from itertools import count
+
+from metrics import ADMISSION_REJECTED
+
+
+class AdmissionRejected(Exception):
+    """A request shed before doing any work; carries the HTTP status and Retry-After hint."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded, prioritised wait queue.
+
+    Up to `max_concurrent` requests run at once; up to `max_queue` more wait, lowest
+    priority value first. A request is rejected immediately with 429 when the queue is full
+    and with 503 when its expected wait (queue position times the moving-average service
+    time) already exceeds its wait budget; a queued request that runs out of budget gets 503.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait_seconds: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._active = 0
+        self._queued = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = count()
+        self.avg_service_seconds = None
+
+    def _expected_wait(self, position: int) -> float:
+        if self.avg_service_seconds is None:
+            return 0.0
+        return math.ceil(position / self.max_concurrent) * self.avg_service_seconds
+
+    def _reject(self, status_code: int, reason: str, retry_after: float):
+        ADMISSION_REJECTED.labels(self.name, reason).inc()
+        raise AdmissionRejected(status_code, reason, max(retry_after, 1.0))
+
+    async def acquire(self, priority: int = 0, wait_budget: float = None):
+        if self._active < self.max_concurrent and not self._queued:
+            self._active += 1
+            return
+        wait_budget = min(wait_budget or self.max_wait_seconds, self.max_wait_seconds)
+        if self._queued >= self.max_queue:
+            self._reject(429, "queue_full", self._expected_wait(self._queued + 1))
+        expected = self._expected_wait(self._queued + 1)
+        if expected > wait_budget:
+            self._reject(503, "deadline", expected)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._queued += 1
+        try:
+            await asyncio.wait_for(future, timeout=wait_budget)
+        except asyncio.TimeoutError:
+            self._queued -= 1
+            self._reject(503, "queue_timeout", self._expected_wait(self._queued + 1))
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over just as this request went away
+            else:
+                self._queued -= 1
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter; the active count is unchanged.
+                self._queued -= 1
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def record_service_time(self, seconds: float):
+        if self.avg_service_seconds is None:
+            self.avg_service_seconds = seconds
+        else:
+            self.avg_service_seconds = 0.9 * self.avg_service_seconds + 0.1 * seconds
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0, wait_budget: float = None):
+        await self.acquire(priority, wait_budget)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            yield
+        finally:
+            self.record_service_time(loop.time() - started)
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_service_seconds": round(self.avg_service_seconds, 3) if self.avg_service_seconds else None,
+        }
+
+
+def build_admission_controllers(admission_cfg: dict) -> dict:
+    return {
+        name: AdmissionController(name, **limits)
+        for name, limits in admission_cfg["endpoints"].items()
+    }
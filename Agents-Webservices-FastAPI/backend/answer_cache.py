@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+
+import numpy as np
+
+from database import read_ingest_generation
+from hybrid_search import TOKEN_RE
+from keywords import detect_visa_family
+
+
+def query_identifiers(query: str) -> frozenset:
+    """Form and visa identifiers named in a query, such as "i-485" or "h-1b", else its visa family.
+
+    Only tokens containing a digit count, with hyphens dropped so "I-485" and "H1B" match
+    "i485" and "h-1b". A query that names none falls back to its detected visa family.
+    """
+    identifiers = {
+        token.replace("-", "") for token in TOKEN_RE.findall(query.lower()) if any(c.isdigit() for c in token)
+    }
+    if not identifiers and (family := detect_visa_family(query)):
+        identifiers.add(f"family:{family}")
+    return frozenset(identifiers)
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache of research answers keyed on the query embedding.
+
+    A lookup hits when a cached query names the same form and visa identifiers as the new
+    one and its embedding has cosine similarity of at least `similarity_threshold` with
+    the new one's; embeddings alone barely separate "I-130" from "I-131". The cache
+    empties itself whenever the collection is re-ingested.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.92, ttl_seconds: float = 86400, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (unit embedding, identifiers, answer, chunks, stored_at)
+        self._keys = count()
+        self._lock = threading.Lock()
+        self._generation = read_ingest_generation()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_generation(self):
+        generation = read_ingest_generation()
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def _purge_expired(self, now: float):
+        expired = [k for k, (*_, stored_at) in self._entries.items() if now - stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, embedding, query: str):
+        """Returns (answer, chunks) for a semantically equivalent cached query, or None."""
+        vector = self._normalize(embedding)
+        identifiers = query_identifiers(query)
+        with self._lock:
+            self._check_generation()
+            self._purge_expired(time.time())
+            keys = [k for k, entry in self._entries.items() if entry[1] == identifiers]
+            if keys:
+                matrix = np.stack([self._entries[k][0] for k in keys])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    _, _, answer, chunks, _ = self._entries[key]
+                    return answer, chunks
+            self.misses += 1
+            return None
+
+    def store(self, embedding, query: str, answer: str, chunks: list):
+        entry = (self._normalize(embedding), query_identifiers(query), answer, chunks, time.time())
+        with self._lock:
+            self._check_generation()
+            self._entries[next(self._keys)] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,211 @@
+"""
+Offline load test for the FastAPI backend.
+
+Builds a small fixture Chroma collection from a few sample_data files, starts the stub
+LLM server and the app against it, drives /chat and /research at each requested
+concurrency level, then writes a throughput and latency report. No OpenAI calls are made.
+
+    python benchmarks/load_test.py --concurrency 1 8 32 --requests 200 --stub-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import count
+
+import httpx
+import yaml
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+SAMPLE_DATA_DIR = os.path.join(BACKEND_DIR, "sample_data")
+
+FIXTURE_FILES = ["E-1_visa.json", "EB-5_visa.json", "F-1_visa.json", "Adjustment_of_status.json"]
+
+RESEARCH_QUESTIONS = [
+    "How long does an E-1 visa last?",
+    "What investment is required for the EB-5 visa?",
+    "Can an F-1 student work off campus?",
+    "What is adjustment of status?",
+    "Who qualifies for an E-1 treaty trader visa?",
+    "Does the EB-5 program lead to a green card?",
+    "What is the I-485 form used for?",
+    "How do F-1 students apply for OPT?",
+]
+CHAT_MESSAGES = [
+    "What is a green card?",
+    "How do I renew my visa?",
+    "What does USCIS do?",
+    "Explain the naturalization process briefly.",
+]
+# The request number keeps every question distinct, so single-flight coalescing does not
+# collapse concurrent requests and each one exercises the full pipeline.
+ENDPOINTS = {
+    "chat": ("/chat", lambda i: {"message": f"{CHAT_MESSAGES[i % len(CHAT_MESSAGES)]} (request {i})"}),
+    "research": ("/research", lambda i: {"question": f"{RESEARCH_QUESTIONS[i % len(RESEARCH_QUESTIONS)]} (request {i})"}),
+}
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_load(base_url: str, endpoint: str, concurrency: int, total_requests: int, timeout: float) -> dict:
+    path, make_payload = ENDPOINTS[endpoint]
+    latencies, errors = [], 0
+    next_request = count()
+
+    async def worker(client):
+        nonlocal errors
+        while (i := next(next_request)) < total_requests:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=make_payload(i))
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+    }
+
+
+def wait_for(url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} did not become ready within {timeout}s")
+
+
+def build_fixture(workdir: str, use_cache: bool) -> dict:
+    """Creates the fixture docs, config and Chroma collection; returns the env for child processes."""
+    docs_dir = os.path.join(workdir, "docs")
+    os.makedirs(docs_dir)
+    for filename in FIXTURE_FILES:
+        shutil.copy(os.path.join(SAMPLE_DATA_DIR, filename), docs_dir)
+
+    with open(os.path.join(BACKEND_DIR, "config", "config.yaml")) as f:
+        cfg = yaml.safe_load(f)
+    cfg["answer_cache"]["enabled"] = use_cache
+    config_path = os.path.join(workdir, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(cfg, f)
+
+    env = {
+        **os.environ,
+        "CHROMA_PATH": os.path.join(workdir, "chroma_db"),
+        "DOCS_DIR": docs_dir,
+        "APP_CONFIG_PATH": config_path,
+        "OPENAI_API_KEY": "stub-key",
+        "TOKENIZERS_PARALLELISM": "false",
+    }
+    subprocess.run([sys.executable, "setup_data.py"], cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    return env
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<10}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for r in report["results"]:
+        print(f"{r['endpoint']:<10}{r['concurrency']:>6}{r['throughput_rps']:>10}{r['p50_ms']:>10}{r['p90_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=["chat", "research"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="stub LLM seconds to first token")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--stub-completion-tokens", type=int, default=120)
+    parser.add_argument("--use-cache", action="store_true", help="keep the semantic answer cache enabled")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request client timeout in seconds")
+    parser.add_argument("--output", default=os.path.join(BENCHMARKS_DIR, "results", "load_test_report.json"))
+    args = parser.parse_args()
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        try:
+            print("Building fixture collection...")
+            env = build_fixture(workdir, args.use_cache)
+            env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}/v1"
+
+            processes.append(subprocess.Popen([
+                sys.executable, os.path.join(BENCHMARKS_DIR, "stub_llm_server.py"),
+                "--port", str(args.stub_port),
+                "--latency", str(args.stub_latency),
+                "--tokens-per-sec", str(args.stub_tokens_per_sec),
+                "--completion-tokens", str(args.stub_completion_tokens),
+            ], env=env))
+            processes.append(subprocess.Popen([
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--host", "127.0.0.1", "--port", str(args.app_port), "--log-level", "warning",
+            ], cwd=BACKEND_DIR, env=env))
+
+            wait_for(f"http://127.0.0.1:{args.stub_port}/health", timeout=30)
+            wait_for(f"http://127.0.0.1:{args.app_port}/readyz", timeout=300)
+
+            base_url = f"http://127.0.0.1:{args.app_port}"
+            results = []
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    print(f"Running {endpoint} at concurrency {concurrency}...")
+                    results.append(asyncio.run(run_load(base_url, endpoint, concurrency, args.requests, args.timeout)))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=30)
+
+    report = {
+        "stub_llm": {
+            "latency_seconds": args.stub_latency,
+            "tokens_per_sec": args.stub_tokens_per_sec,
+            "completion_tokens": args.stub_completion_tokens,
+        },
+        "answer_cache": args.use_cache,
+        "fixture_files": FIXTURE_FILES,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
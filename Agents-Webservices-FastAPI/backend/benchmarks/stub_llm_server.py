@@ -0,0 +1,113 @@
+"""
+Stub OpenAI-compatible chat completions server for offline load tests.
+
+Answers POST /v1/chat/completions (streaming and non-streaming) with filler text after a
+configurable time to first token, then emits tokens at a configurable rate.
+
+    python benchmarks/stub_llm_server.py --port 9100 --latency 0.5 --tokens-per-sec 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI(title="Stub LLM")
+
+stub_cfg = {"latency": 0.5, "tokens_per_sec": 50.0, "completion_tokens": 120}
+
+FILLER = "Immigration processing times vary by form and service center so check the USCIS website".split()
+
+
+def completion_tokens():
+    return [FILLER[i % len(FILLER)] + " " for i in range(stub_cfg["completion_tokens"])]
+
+
+def count_prompt_tokens(body: dict) -> int:
+    return sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+
+
+def usage(prompt_tokens: int) -> dict:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": stub_cfg["completion_tokens"],
+        "total_tokens": prompt_tokens + stub_cfg["completion_tokens"],
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "stub")
+    prompt_tokens = count_prompt_tokens(body)
+    tokens = completion_tokens()
+    token_interval = 1 / stub_cfg["tokens_per_sec"]
+
+    if not body.get("stream"):
+        await asyncio.sleep(stub_cfg["latency"] + len(tokens) * token_interval)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage(prompt_tokens),
+        }
+
+    def chunk(delta: dict, finish_reason=None, **extra) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def events():
+        await asyncio.sleep(stub_cfg["latency"])
+        yield chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            yield chunk({"content": token})
+            await asyncio.sleep(token_interval)
+        yield chunk({}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": [], "usage": usage(prompt_tokens)}
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=stub_cfg["latency"], help="seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=stub_cfg["tokens_per_sec"])
+    parser.add_argument("--completion-tokens", type=int, default=stub_cfg["completion_tokens"])
+    args = parser.parse_args()
+    stub_cfg.update(latency=args.latency, tokens_per_sec=args.tokens_per_sec, completion_tokens=args.completion_tokens)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import asyncio
+import re
+
+from context_assembler import get_encoding
+from hybrid_search import tokenize
+from llm import ainvoke_with_retry, get_llm, llm_cfg
+from metrics import CASCADE_CALLS, LLM_ESTIMATED_COST, TIER_TOKENS, observe_stage
+from settings import app_cfg
+
+
+def mean_token_logprob(response):
+    """Mean log probability of the answer tokens, or None when the model did not return logprobs."""
+    logprobs = (response.response_metadata.get("logprobs") or {}).get("content") or []
+    if not logprobs:
+        return None
+    return sum(token["logprob"] for token in logprobs) / len(logprobs)
+
+
+def grounding(answer: str, context: str) -> float:
+    """Share of the answer's content words that also appear in the retrieved context."""
+    words = [w for w in tokenize(answer) if len(w) > 3]
+    if not words:
+        return 0.0
+    context_words = set(tokenize(context))
+    return sum(w in context_words for w in words) / len(words)
+
+
+def record_tier_usage(tier: dict, usage_metadata):
+    if not usage_metadata:
+        return
+    input_tokens, output_tokens = usage_metadata.get("input_tokens", 0), usage_metadata.get("output_tokens", 0)
+    TIER_TOKENS.labels(tier["name"], "prompt").inc(input_tokens)
+    TIER_TOKENS.labels(tier["name"], "completion").inc(output_tokens)
+    LLM_ESTIMATED_COST.labels(tier["name"]).inc(
+        (input_tokens * tier.get("input_cost_per_million", 0) + output_tokens * tier.get("output_cost_per_million", 0)) / 1e6
+    )
+
+
+class ModelCascade:
+    """Tries easy questions on the cheapest model first and escalates when its answer fails the confidence check.
+
+    Tiers are ordered cheapest first. Questions that do not look easy go straight to the
+    last (strongest) tier, whose answer is always accepted.
+    """
+
+    def __init__(self, tiers: list, routing: dict, confidence: dict, encoding_name: str):
+        self.tiers = tiers
+        self.max_question_tokens = routing["max_question_tokens"]
+        self.simple_patterns = [re.compile(p, re.IGNORECASE) for p in routing["simple_patterns"]]
+        self.confidence = confidence
+        self.encoding_name = encoding_name
+
+    def is_simple(self, question: str) -> bool:
+        if len(get_encoding(self.encoding_name).encode(question)) > self.max_question_tokens:
+            return False
+        return any(p.search(question) for p in self.simple_patterns)
+
+    def route(self, question: str) -> list:
+        return self.tiers if self.is_simple(question) else self.tiers[-1:]
+
+    def is_confident(self, response, context: str = None) -> bool:
+        cfg = self.confidence
+        answer = response.content.strip()
+        if len(answer) < cfg["min_answer_chars"]:
+            return False
+        lowered = answer.lower()
+        if any(phrase in lowered for phrase in cfg["uncertain_phrases"]):
+            return False
+        mean_logprob = mean_token_logprob(response)
+        if cfg["min_mean_logprob"] is not None and mean_logprob is not None and mean_logprob < cfg["min_mean_logprob"]:
+            return False
+        return context is None or grounding(answer, context) >= cfg["min_grounding"]
+
+    async def ainvoke(self, endpoint: str, llm_input, question: str, temperature: float,
+                      context: str = None, deadline_seconds: float = None, **kwargs) -> str:
+        """Returns the content of the first accepted answer.
+
+        `context` is the retrieved text the answer should be grounded in, if any.
+        `deadline_seconds` bounds all tiers together; a tier's `timeout_seconds` bounds that tier alone.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if deadline_seconds is None else loop.time() + deadline_seconds
+        tiers = self.route(question)
+        for i, tier in enumerate(tiers):
+            last = i == len(tiers) - 1
+            llm = get_llm(tier["model"], tier.get("temperature", temperature), tier.get("base_url"), tier.get("logprobs", False))
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                CASCADE_CALLS.labels(endpoint, tier["name"], "error").inc()
+                raise asyncio.TimeoutError("Request deadline exceeded")
+            # Cheaper tiers get one short attempt so a slow or failing one falls through quickly.
+            max_retries = tier.get("max_retries") if last else tier.get("max_retries", 0)
+            timeout = tier.get("timeout_seconds")
+            if timeout is not None:
+                remaining = timeout if remaining is None else min(remaining, timeout)
+            try:
+                with observe_stage(f"llm_tier_{tier['name']}"):
+                    response = await ainvoke_with_retry(llm, llm_input, deadline_seconds=remaining,
+                                                        max_retries=max_retries, **kwargs)
+            except Exception:
+                CASCADE_CALLS.labels(endpoint, tier["name"], "error").inc()
+                if last:
+                    raise
+                continue
+            record_tier_usage(tier, response.usage_metadata)
+            if last or self.is_confident(response, context):
+                CASCADE_CALLS.labels(endpoint, tier["name"], "accepted").inc()
+                return response.content
+            CASCADE_CALLS.labels(endpoint, tier["name"], "escalated").inc()
+
+
+def build_cascade(cfg: dict) -> ModelCascade:
+    """With the cascade disabled every request goes to the configured llm.model, as before."""
+    tiers = cfg["tiers"] if cfg["enabled"] else [{"name": "default", "model": llm_cfg["model"]}]
+    return ModelCascade(tiers, cfg["routing"], cfg["confidence"], app_cfg["context"]["encoding"])
+
+
+cascade = build_cascade(app_cfg["cascade"])
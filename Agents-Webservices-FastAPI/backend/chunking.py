@@ -0,0 +1,50 @@
+import hashlib
+import json, os
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from keywords import detect_visa_family
+
+# Kept free of database imports: ingestion runs these functions in worker processes.
+
+# Bump when split_documents changes the chunk metadata, so the next ingest re-processes
+# every file instead of skipping unchanged ones (2: visa_family, 3: directory-qualified sources).
+CHUNK_SCHEMA_VERSION = 3
+
+def safe_load_json(path):
+    for enc in ("utf-8", "latin-1"):
+        try:
+            with open(path, encoding=enc) as f: d = json.load(f); break
+        except UnicodeDecodeError: continue
+    return [json_to_document(d, os.path.basename(path))]
+
+def json_to_document(d: dict, filename: str) -> Document:
+    return Document(page_content=d.get("text",""),
+                    metadata={"title": d.get("title", filename),
+                              "URL": d.get("URL","")})
+
+def file_fingerprint(path, chunk_size: int, chunk_overlap: int) -> str:
+    """Hash of the file bytes plus the splitter settings and metadata schema that shape its chunks."""
+    h = hashlib.sha256(f"{CHUNK_SCHEMA_VERSION}:{chunk_size}:{chunk_overlap}:".encode())
+    with open(path, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+def chunk_fingerprint(content: str, metadata: dict) -> str:
+    payload = json.dumps({"content": content, "metadata": metadata}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def load_and_split(path, source: str, chunk_size: int, chunk_overlap: int):
+    """Returns [(chunk_id, content, metadata, chunk_hash)] for one JSON document stored under `source`."""
+    return split_documents(safe_load_json(path), source, chunk_size, chunk_overlap)
+
+def split_documents(documents, source: str, chunk_size: int, chunk_overlap: int):
+    """`source` names the document in chunk ids and metadata: a filename, optionally prefixed by its directory."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = splitter.split_documents(documents)
+    result = []
+    for i, c in enumerate(chunks):
+        filename = os.path.splitext(os.path.basename(source))[0]
+        family = detect_visa_family(c.metadata["title"]) or detect_visa_family(filename) or "general"
+        metadata = {**c.metadata, "source": source, "chunk": i, "visa_family": family}
+        result.append((f"{source}_{i}", c.page_content, metadata, chunk_fingerprint(c.page_content, metadata)))
+    return result
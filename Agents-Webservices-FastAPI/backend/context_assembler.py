@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str):
+    return tiktoken.get_encoding(name)
+
+
+def overlap_length(left: str, right: str, min_chars: int, max_chars: int) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right` (0 if shorter than min_chars)."""
+    for size in range(min(len(left), len(right), max_chars), min_chars - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def stitch_passages(chunks: list, min_overlap_chars: int, max_overlap_chars: int) -> list:
+    """Merges chunks that are neighbours in the same source document, dropping the text they share.
+
+    Returns (title, text) passages ordered by the best retrieval rank among their chunks.
+    """
+    groups = {}
+    for rank, chunk in enumerate(chunks):
+        metadata = chunk.get("metadata") or {}
+        source = metadata.get("source", chunk["title"])
+        groups.setdefault(source, []).append((metadata.get("chunk"), rank, chunk))
+
+    passages = []
+    for members in groups.values():
+        members.sort(key=lambda m: (m[0] is None, m[0] if m[0] is not None else m[1]))
+        run_index, run_rank, run_text = None, None, None
+        for index, rank, chunk in members:
+            if run_text is not None and index is not None and run_index is not None and index == run_index + 1:
+                shared = overlap_length(run_text, chunk["content"], min_overlap_chars, max_overlap_chars)
+                run_text += chunk["content"][shared:] if shared else "\n" + chunk["content"]
+                run_index, run_rank = index, min(run_rank, rank)
+                continue
+            if run_text is not None:
+                passages.append((run_rank, chunk_title, run_text))
+            run_index, run_rank, run_text, chunk_title = index, rank, chunk["content"], chunk["title"]
+        passages.append((run_rank, chunk_title, run_text))
+
+    passages.sort(key=lambda p: p[0])
+    return [(title, text) for _, title, text in passages]
+
+
+def assemble_context(chunks: list, max_tokens: int, encoding_name: str = "o200k_base",
+                     min_overlap_chars: int = 20, max_overlap_chars: int = 300) -> str:
+    """Stitches neighbouring chunks and packs the passages, best first, into `max_tokens`.
+
+    The passage that crosses the budget is cut at a token boundary; later ones are dropped.
+    """
+    encoding = get_encoding(encoding_name)
+    parts, used = [], 0
+    for title, text in stitch_passages(chunks, min_overlap_chars, max_overlap_chars):
+        part = f"From {title}:\n{text}"
+        tokens = encoding.encode(part)
+        separator = 2 if parts else 0  # the "\n\n" joining parts
+        remaining = max_tokens - used - separator
+        if remaining <= 0:
+            break
+        if len(tokens) > remaining:
+            parts.append(encoding.decode(tokens[:remaining]))
+            break
+        parts.append(part)
+        used += len(tokens) + separator
+    return "\n\n".join(parts)
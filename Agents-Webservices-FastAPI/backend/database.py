@@ -1,15 +1,124 @@
-import chromadb
-from langchain_huggingface import HuggingFaceEmbeddings
+import json
 import os
-CHROMA_PATH = os.path.join(os.path.dirname(__file__), "chroma_db")
-DOCS_DIR = os.path.join(os.path.dirname(__file__), "sample_data")
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+CHROMA_PATH = os.getenv("CHROMA_PATH", os.path.join(os.path.dirname(__file__), "chroma_db"))
+DOCS_DIR = os.getenv("DOCS_DIR", os.path.join(os.path.dirname(__file__), "sample_data"))
 COLLECTION_NAME = "sample_data"
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Rewritten after every ingestion so long-running processes can detect stale caches.
+INGEST_MARKER_PATH = os.path.join(CHROMA_PATH, "ingest_generation")
+BM25_INDEX_PATH = os.path.join(CHROMA_PATH, "bm25_index.json")
+# Names the collection queries are served from; full rebuilds write a new version and swap this.
+ACTIVE_POINTER_PATH = os.path.join(CHROMA_PATH, "active_collection.json")
 
-# Initialize embeddings
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+# The embedding model and Chroma client are heavy, so they are created on first use
+# (normally by the app's startup warmup) rather than at import time.
+_embeddings = None
+_client = None
+_collection = None
+_lock = threading.Lock()
+_active_pointer = (None, None)  # (pointer file mtime_ns, pointer)
+_pins = defaultdict(int)
 
-# Initialize ChromaDB
-client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = client.get_or_create_collection(COLLECTION_NAME)
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    return _embeddings
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _client
+
+
+def read_active_pointer() -> dict:
+    """{"name", "version", "retired": [{"name", "retired_at"}]}; the unversioned collection until a rebuild swaps."""
+    global _active_pointer
+    try:
+        mtime = os.stat(ACTIVE_POINTER_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return {"name": COLLECTION_NAME, "version": 0, "retired": []}
+    if _active_pointer[0] != mtime:
+        with open(ACTIVE_POINTER_PATH, encoding="utf-8") as f:
+            _active_pointer = (mtime, json.load(f))
+    return _active_pointer[1]
+
+
+def write_active_pointer(pointer: dict):
+    # os.replace is atomic, so readers see either the old or the new pointer.
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    tmp_path = ACTIVE_POINTER_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pointer, f, indent=2)
+    os.replace(tmp_path, ACTIVE_POINTER_PATH)
+
+
+def get_collection():
+    """The active collection, re-resolved whenever the active pointer changes."""
+    # Vectors always come from get_embeddings() (at ingest and at query time),
+    # so Chroma's own default embedding model is never loaded.
+    global _collection
+    name = read_active_pointer()["name"]
+    collection = _collection
+    if collection is None or collection.name != name:
+        client = get_client()
+        with _lock:
+            if _collection is None or _collection.name != name:
+                _collection = client.get_or_create_collection(name, embedding_function=None)
+            collection = _collection
+    return collection
+
+
+@contextmanager
+def pinned_collection():
+    """Yields the active collection and keeps this process from dropping it until the block exits."""
+    collection = get_collection()
+    with _lock:
+        _pins[collection.name] += 1
+    try:
+        yield collection
+    finally:
+        with _lock:
+            _pins[collection.name] -= 1
+
+
+def is_pinned(name: str) -> bool:
+    with _lock:
+        return _pins[name] > 0
+
+
+def bm25_index_path(collection_name: str = None) -> str:
+    collection_name = collection_name or read_active_pointer()["name"]
+    if collection_name == COLLECTION_NAME:
+        return BM25_INDEX_PATH
+    return os.path.join(CHROMA_PATH, f"bm25_index_{collection_name}.json")
+
+
+def resources_loaded() -> dict:
+    return {"embedding_model": _embeddings is not None, "collection": _collection is not None}
+
+
+def read_ingest_generation() -> int:
+    try:
+        return os.stat(INGEST_MARKER_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump_ingest_generation():
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    with open(INGEST_MARKER_PATH, "w") as f:
+        f.write(str(time.time_ns()))
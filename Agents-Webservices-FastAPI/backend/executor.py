@@ -0,0 +1,16 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from settings import app_cfg
+
+# Embedding and Chroma calls are blocking; run them here instead of on the event loop.
+executor = ThreadPoolExecutor(
+    max_workers=app_cfg["executor"]["max_workers"],
+    thread_name_prefix="rag-worker",
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
@@ -0,0 +1,125 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from database import bm25_index_path, read_ingest_generation
+
+# Keeps form and visa identifiers such as "i-765", "eb-5" and "h-1b" as single tokens.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if "-" in token:
+            tokens.extend(token.split("-"))
+    return tokens
+
+
+class BM25Index:
+    """In-process Okapi BM25 inverted index over chunk ids.
+
+    Only per-chunk term frequencies are persisted; postings and lengths are derived on load,
+    which keeps incremental updates during ingestion to plain dict operations.
+    """
+
+    def __init__(self, doc_terms: dict = None, doc_families: dict = None, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = doc_terms or {}  # chunk_id -> {term: tf}
+        self.doc_families = doc_families or {}  # chunk_id -> visa family
+        self._postings = None
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, chunk_id: str, text: str, family: str = None):
+        self.doc_terms[chunk_id] = dict(Counter(tokenize(text)))
+        if family:
+            self.doc_families[chunk_id] = family
+        self._postings = None
+
+    def remove(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            self.doc_terms.pop(chunk_id, None)
+            self.doc_families.pop(chunk_id, None)
+        self._postings = None
+
+    def _build(self):
+        postings = defaultdict(list)
+        lengths = {}
+        for chunk_id, terms in self.doc_terms.items():
+            lengths[chunk_id] = sum(terms.values())
+            for term, tf in terms.items():
+                postings[term].append((chunk_id, tf))
+        self._postings = postings
+        self._lengths = lengths
+        self._avg_length = sum(lengths.values()) / len(lengths) if lengths else 0.0
+
+    def search(self, query: str, k: int, family: str = None) -> list:
+        """Returns up to k (chunk_id, score) pairs, best first, optionally limited to one visa family.
+
+        Chunks indexed without a family are never filtered out.
+        """
+        if self._postings is None:
+            self._build()
+        n_docs = len(self.doc_terms)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings:
+                if family and self.doc_families.get(chunk_id, family) != family:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / self._avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path: str = None):
+        path = path or bm25_index_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_terms": self.doc_terms, "doc_families": self.doc_families}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = None):
+        path = path or bm25_index_path()
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["doc_terms"], data.get("doc_families"), k1=data["k1"], b=data["b"])
+
+
+def reciprocal_rank_fusion(rankings: list, weights: list, k: int = 60) -> list:
+    """Fuses ranked id lists: score(id) = sum(weight / (k + rank)). Returns (id, score) pairs, best first."""
+    scores = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+_index = None
+_index_generation = None
+_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """The persisted index, reloaded whenever an ingestion has run since it was last read."""
+    global _index, _index_generation
+    generation = read_ingest_generation()
+    if _index is None or generation != _index_generation:
+        with _index_lock:
+            if _index is None or generation != _index_generation:
+                _index = BM25Index.load() or BM25Index()
+                _index_generation = generation
+    return _index
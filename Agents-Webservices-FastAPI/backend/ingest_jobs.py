@@ -0,0 +1,93 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class IngestQueueFull(Exception):
+    """Raised by submit when `max_pending` jobs are already queued or running."""
+
+
+class IngestJobs:
+    """Runs ingestion jobs off the request path and keeps their progress for polling.
+
+    Jobs use their own threads so a long ingest never takes workers from the
+    embedding and Chroma calls made by live requests. At most `max_pending` jobs
+    are queued or running at once; of the finished ones, only the most recent
+    `max_jobs` are remembered.
+    """
+
+    def __init__(self, max_workers: int = 1, max_jobs: int = 100, max_pending: int = 10):
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func, **kwargs) -> str:
+        """Queues func(progress=..., **kwargs) and returns the job id at once.
+
+        Raises IngestQueueFull when `max_pending` jobs are already queued or running.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._pending() >= self.max_pending:
+                raise IngestQueueFull(f"{self.max_pending} ingestion jobs already queued or running")
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "total_chunks": None,
+                "processed_chunks": 0,
+                "chunks_per_sec": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+                "report": None,
+            }
+            self._evict_finished()
+        self._executor.submit(self._run, job_id, func, kwargs)
+        return job_id
+
+    def _pending(self) -> int:
+        return sum(job["status"] in ("queued", "running") for job in self._jobs.values())
+
+    def _evict_finished(self):
+        # Queued and running jobs are never evicted, so they stay pollable until they finish.
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] not in ("queued", "running")]
+        for job_id in finished[:max(len(finished) - self.max_jobs, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, func, kwargs):
+        started = time.time()
+        self._update(job_id, status="running", started_at=started)
+
+        def progress(done, total):
+            elapsed = time.time() - started
+            self._update(
+                job_id,
+                processed_chunks=done,
+                total_chunks=total,
+                chunks_per_sec=round(done / elapsed, 1) if elapsed > 0 else None,
+            )
+
+        try:
+            report = func(progress=progress, **kwargs)
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e) or type(e).__name__, finished_at=time.time())
+            return
+        self._update(job_id, status="succeeded", report=report, finished_at=time.time())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,33 @@
+import re
+
+IMMIGRATION_KEYWORDS = [
+    "visa", "green card", "asylum", "citizenship", "immigration", "uscis", "adjustment of status",
+    "naturalization", "deportation", "work permit", "travel ban", "refugee", "DACA", "TPS", "I-94", "I-130",
+    "I-485", "I-140", "I-765", "I-539", "I-601", "I-212", "I-864", "I-129", "I-131", "I-797", "I-9",
+    "EAD", "H-1B", "F-1", "J-1", "EB-1", "EB-2", "EB-3", "EB-5", "E-2", "E-3", "E-1", "L-1", "O-1", "TN",
+    "US immigration", "USCIS", "CBP", "ICE", "consular processing", "removal proceedings"
+]
+
+# Visa families used to partition the collection. Query keywords come from IMMIGRATION_KEYWORDS;
+# F-2 and J-2 only appear in document titles.
+VISA_FAMILY_KEYWORDS = {
+    "EB": ["EB-1", "EB-2", "EB-3", "EB-5", "I-140"],
+    "F/J": ["F-1", "F-2", "J-1", "J-2"],
+    "E": ["E-1", "E-2", "E-3"],
+    "asylum": ["asylum", "refugee"],
+    "adjustment": ["adjustment of status", "I-485"],
+    "H/L": ["H-1B", "L-1"],
+    "O": ["O-1"],
+}
+
+_FAMILY_PATTERNS = {
+    family: re.compile("|".join(rf"(?<![a-z0-9]){re.escape(kw.lower())}(?![a-z0-9])" for kw in keywords))
+    for family, keywords in VISA_FAMILY_KEYWORDS.items()
+}
+
+
+def detect_visa_family(text: str):
+    """The single visa family named in `text`, or None when there is none or more than one."""
+    text_lower = text.lower().replace("_", " ")
+    matches = [family for family, pattern in _FAMILY_PATTERNS.items() if pattern.search(text_lower)]
+    return matches[0] if len(matches) == 1 else None
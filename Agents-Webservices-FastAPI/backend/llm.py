@@ -0,0 +1,117 @@
+import asyncio
+import os
+import threading
+from functools import lru_cache
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+from metrics import record_token_usage
+from resilience import CircuitBreaker, call_with_retry
+from settings import app_cfg
+
+load_dotenv()
+
+llm_cfg = app_cfg["llm"]
+
+# One connection pool per process, shared by every ChatOpenAI instance.
+_limits = httpx.Limits(
+    max_connections=llm_cfg["max_connections"],
+    max_keepalive_connections=llm_cfg["max_keepalive_connections"],
+)
+http_client = httpx.Client(limits=_limits)
+http_async_client = httpx.AsyncClient(limits=_limits)
+
+
+# One breaker per (endpoint, model), shared by /chat and /research, so one brownout trips it for
+# both; a cascade tier whose model keeps failing cannot open the circuit of the tier that backs it up.
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(base_url: str = None, model_name: str = llm_cfg["model"]) -> CircuitBreaker:
+    """The circuit breaker for a model on an OpenAI-compatible endpoint; None means the default provider."""
+    key = f"{model_name}@{base_url or 'default'}"
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(**llm_cfg["circuit_breaker"])
+        return _breakers[key]
+
+
+def breaker_for(llm: ChatOpenAI) -> CircuitBreaker:
+    return get_breaker(llm.openai_api_base, llm.model_name)
+
+
+def breaker_status() -> dict:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {key: b.status() for key, b in breakers.items()}
+
+
+@lru_cache(maxsize=None)
+def get_llm(model_name: str = llm_cfg["model"], temperature: float = 0.7,
+            base_url: str = None, logprobs: bool = False) -> ChatOpenAI:
+    """`base_url` points a model at another OpenAI-compatible server, such as a local one."""
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+        logprobs=logprobs or None,
+        timeout=llm_cfg["request_timeout"],
+        stream_usage=True,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+async def aclose_llm_clients():
+    await http_async_client.aclose()
+    http_client.close()
+
+
+def is_transient(error: Exception) -> bool:
+    """Connection errors, timeouts, rate limits and 5xx: worth retrying, and a sign of the provider's health."""
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+async def ainvoke_with_retry(llm: ChatOpenAI, llm_input, deadline_seconds: float = None,
+                             max_retries: int = None, **kwargs):
+    """`deadline_seconds` tightens the configured overall deadline for this call, retries included;
+    `max_retries` overrides the configured retry count."""
+    retry_cfg = dict(llm_cfg["retry"])
+    if deadline_seconds is not None:
+        retry_cfg["deadline_seconds"] = min(deadline_seconds, retry_cfg["deadline_seconds"])
+    if max_retries is not None:
+        retry_cfg["max_retries"] = max_retries
+    response = await call_with_retry(
+        lambda: llm.ainvoke(llm_input, **kwargs), breaker=breaker_for(llm), is_transient=is_transient, **retry_cfg
+    )
+    record_token_usage(response.usage_metadata)
+    return response
+
+
+async def astream_with_breaker(llm: ChatOpenAI, llm_input, **kwargs):
+    """Streams message chunks; the model's breaker is consulted once and told how the stream ended."""
+    breaker = breaker_for(llm)
+    probe = breaker.before_call()
+    try:
+        async for piece in llm.astream(llm_input, **kwargs):
+            record_token_usage(piece.usage_metadata)
+            yield piece
+    except Exception as e:
+        if is_transient(e):
+            breaker.record_failure()
+        elif probe:
+            breaker.release_probe()
+        raise
+    except BaseException:
+        # Cancelled or closed early because the client disconnected mid-stream.
+        if probe:
+            breaker.release_probe()
+        raise
+    breaker.record_success()
@@ -1,22 +1,128 @@
 #  `main.py` will wrap it in a FastAPI app# This is a sample Python script.
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+import hmac
+import json
+import os
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from typing import List
-from rag_service import answer_research_question
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from typing import List, Optional
+from rag_service import answer_cache, answer_research_batch, answer_research_question, research_flight, stream_research_answer
 from openai import BaseModel
 
-from services import get_ai_response
+from admission import AdmissionRejected, build_admission_controllers
+from database import read_active_pointer
+from executor import executor, run_blocking
+from ingest_jobs import IngestJobs, IngestQueueFull
+from llm import aclose_llm_clients, breaker_status
+from metrics import record_outcome
+from resilience import CircuitOpenError
+from services import get_ai_response, session_store, stream_ai_response
+from settings import app_cfg
+from setup_data import ingest_documents, ingest_json, ingest_root, rebuild_collection
+from startup import readiness, startup_state, warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: the process answers /healthz at once and /readyz
+    # flips to 200 when the model and collection are loaded.
+    startup_state["phase_seconds"]["import_app"] = round(time.perf_counter() - _import_started, 3)
+    warmup = asyncio.create_task(run_blocking(warm_up))
+    yield
+    warmup.cancel()
+    await aclose_llm_clients()
+    executor.shutdown(wait=False)
+    ingest_jobs.shutdown()
+
+
 app = FastAPI(
     title="AI Chatbot API",
     description="A simple AI chatbot API powered by LangChain and OpenAI's GPT model.",
     version="1.0.0",
+    lifespan=lifespan,
+)
+
+admission = build_admission_controllers(app_cfg["admission"])
+ingest_jobs = IngestJobs(
+    max_workers=app_cfg["ingest"]["job_workers"],
+    max_jobs=app_cfg["ingest"]["max_jobs"],
+    max_pending=app_cfg["ingest"]["max_pending_jobs"],
 )
 
+LATENCY_BUDGET_HEADER = "X-Latency-Budget-Ms"
+# Comma-separated API keys whose requests use the priority lane; kept out of config.yaml like other secrets.
+PRIORITY_API_KEYS = [k.strip() for k in os.getenv("PRIORITY_API_KEYS", "").split(",") if k.strip()]
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": f"Server busy ({exc.reason}); please retry later."},
+        headers={"Retry-After": str(int(exc.retry_after + 0.999))},
+    )
+
+
+def has_priority_key(http_request: Request) -> bool:
+    """True when X-API-Key, or a Bearer token in Authorization, is one of PRIORITY_API_KEYS."""
+    headers = http_request.headers
+    presented = [headers.get("x-api-key", "")]
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer":
+        presented.append(token.strip())
+    return any(
+        hmac.compare_digest(candidate.encode(), key.encode())
+        for candidate in presented if candidate
+        for key in PRIORITY_API_KEYS
+    )
+
+
+def request_priority(http_request: Request) -> int:
+    """0 for callers holding a priority API key, 1 for everyone else (lower is served first)."""
+    if not app_cfg["admission"]["priority_lanes"]:
+        return 0
+    return 0 if has_priority_key(http_request) else 1
+
+
+def wait_budget(http_request: Request) -> Optional[float]:
+    budget_ms = http_request.headers.get(LATENCY_BUDGET_HEADER)
+    try:
+        return float(budget_ms) / 1000 if budget_ms else None
+    except ValueError:
+        return None
+
+
+def research_budget(http_request: Request) -> Optional[float]:
+    """Seconds /research may take end to end: the request's latency budget header, else the configured default."""
+    budget = wait_budget(http_request)
+    if budget is None and app_cfg["degradation"]["default_budget_ms"]:
+        budget = app_cfg["degradation"]["default_budget_ms"] / 1000
+    return budget
+
+
+def admission_slot(name: str, http_request: Request):
+    return admission[name].slot(request_priority(http_request), wait_budget(http_request))
+
+
+async def admit_stream(name: str, http_request: Request, events):
+    limiter = admission[name]
+    await limiter.acquire(request_priority(http_request), wait_budget(http_request))
+    return sse_response(events, limiter)
+
+
 class ChatRequest(BaseModel):
     message : str
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
 
 class ResearchRequest(BaseModel):
     question: str
@@ -24,37 +130,250 @@ class ResearchRequest(BaseModel):
 class Source(BaseModel):
     title: str
     content: str
-    score: float
+    score: Optional[float] = None  # vector distance, lower is better; None when only keyword search found it
+    fused_score: Optional[float] = None  # hybrid retrieval's reciprocal rank fusion score, higher is better
 
 class ResearchResponse(BaseModel):
     answer: str
     sources: List[Source]
+    degraded: bool = False
+
+class BatchResearchRequest(BaseModel):
+    questions: List[str]
+    llm_concurrency: Optional[int] = None
+
+class BatchResearchItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    sources: List[Source] = []
+    error: Optional[str] = None
+
+class BatchResearchResponse(BaseModel):
+    results: List[BatchResearchItem]
+
+class IngestDocument(BaseModel):
+    title: str
+    text: str
+    URL: str = ""
+    filename: Optional[str] = None
+
+class IngestRequest(BaseModel):
+    documents: Optional[List[IngestDocument]] = None
+    directory: Optional[str] = None
+    rebuild: bool = False
+
+
+def format_sources(sources) -> List[Source]:
+    return [
+        Source(
+            title=s["title"],
+            content=s["content"][:200] + "..." if len(s["content"]) > 200 else s["content"],
+            score=s["score"],
+            fused_score=s.get("fused_score"),
+        ) for s in sources
+    ]
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """Holds an already-acquired admission slot until the response is over.
+
+    The slot is released however the response ends, including when the client
+    disconnects before the body is first iterated.
+    """
+
+    def __init__(self, content, limiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.record_service_time(loop.time() - started)
+            self.limiter.release()
+
+
+def sse_response(events, limiter) -> StreamingResponse:
+    return AdmittedStreamingResponse(
+        events,
+        limiter,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     """Chat with an AI assistant"""
-    try:
-        ai_response = get_ai_response(request.message)
-        return ChatResponse(response=ai_response)
+    async with admission_slot("chat", http_request):
+        try:
+            ai_response = await get_ai_response(request.message, request.session_id)
+            record_outcome("chat", "success")
+            return ChatResponse(response=ai_response, session_id=request.session_id)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        except CircuitOpenError as e:
+            record_outcome("chat", "circuit_open")
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+        except Exception as e:
+            record_outcome("chat", "llm_failure")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/research", response_model=ResearchResponse)
-async def ask_research_question(request: ResearchRequest):
+async def ask_research_question(request: ResearchRequest, http_request: Request):
+    """Answer a research question; when the latency budget runs out the answer is retrieval-only and flagged degraded"""
+    arrived = time.perf_counter()
+    budget = research_budget(http_request)
+    async with admission_slot("research", http_request):
+        try:
+            # Time spent queueing for admission comes out of the budget.
+            remaining = None if budget is None else budget - (time.perf_counter() - arrived)
+            answer, sources, degraded = await answer_research_question(request.question, remaining)
+            return ResearchResponse(answer=answer, sources=format_sources(sources), degraded=degraded)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/research/batch", response_model=BatchResearchResponse)
+async def research_batch_endpoint(request: BatchResearchRequest, http_request: Request):
+    """Answer many research questions in one request; failures are reported per question"""
+    batch_cfg = app_cfg["research_batch"]
+    if len(request.questions) > batch_cfg["max_questions"]:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {batch_cfg['max_questions']} questions per batch.",
+        )
+    llm_concurrency = min(request.llm_concurrency or batch_cfg["llm_concurrency"], batch_cfg["llm_concurrency"])
+    async with admission_slot("research_batch", http_request):
+        try:
+            results = await answer_research_batch(request.questions, max(llm_concurrency, 1))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    return BatchResearchResponse(results=[
+        BatchResearchItem(
+            question=r["question"],
+            answer=r["answer"],
+            sources=format_sources(r["sources"]),
+            error=r["error"],
+        ) for r in results
+    ])
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """Chat with an AI assistant, streaming tokens as server-sent events"""
+    async def events():
+        try:
+            async for token in stream_ai_response(request.message, request.session_id):
+                yield sse_event("token", {"text": token})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {})
+
+    return await admit_stream("chat", http_request, events())
+
+@app.post("/research/stream")
+async def research_stream_endpoint(request: ResearchRequest, http_request: Request):
+    """Answer a research question; the first event carries the sources, then tokens follow"""
+    async def events():
+        try:
+            async for kind, payload in stream_research_answer(request.question):
+                if kind == "sources":
+                    yield sse_event("sources", [s.model_dump() for s in format_sources(payload)])
+                elif kind == "token":
+                    yield sse_event("token", {"text": payload})
+                else:
+                    yield sse_event("error", {"detail": payload})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {})
+
+    return await admit_stream("research", http_request, events())
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a chat session's history and summary"""
+    await run_blocking(session_store.delete, session_id)
+    return {"deleted": session_id}
+
+def resolve_ingest_directory(directory: str) -> str:
+    """Resolves a requested directory against ingest.directory_root, refusing anything outside it."""
+    root = ingest_root()
+    path = os.path.realpath(os.path.join(root, directory))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=403, detail="Directory is outside the ingest root")
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=400, detail=f"Directory not found: {directory}")
+    return path
+
+@app.post("/ingest", status_code=202)
+async def ingest(request: IngestRequest):
+    """Start a background ingestion job for posted documents or a server-side directory.
+
+    `directory` is resolved against ingest.directory_root and must stay inside it. With
+    rebuild, the directory (default: the configured docs directory) is indexed into a new
+    collection version that replaces the active one once it passes validation.
+    """
+    if request.documents and request.rebuild:
+        raise HTTPException(status_code=400, detail="rebuild works on a directory, not posted documents")
+    directory = resolve_ingest_directory(request.directory) if request.directory else None
     try:
-        answer, sources = answer_research_question(request.question)
-        formatted = [
-            Source(
-                title=s["title"],
-                content=s["content"][:200] + "..." if len(s["content"]) > 200 else s["content"],
-                score=s["score"]
-            ) for s in sources
-        ]
-        return ResearchResponse(answer=answer, sources=formatted)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        if request.rebuild:
+            job_id = ingest_jobs.submit(rebuild_collection, **({"docs_dir": directory} if directory else {}))
+        elif request.documents:
+            job_id = ingest_jobs.submit(ingest_documents, documents=[d.model_dump() for d in request.documents])
+        elif directory:
+            job_id = ingest_jobs.submit(ingest_json, docs_dir=directory)
+        else:
+            raise HTTPException(status_code=400, detail="Provide either documents or directory")
+    except IngestQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job_id, "status_url": f"/ingest/{job_id}"}
+
+@app.get("/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    """Status, progress and final report of an ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job")
+    return job
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the embedding model and collection are loaded and warmed up"""
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency, outcomes, token and chunk counts"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/status")
+async def status():
+    """Circuit breaker state, request coalescing counters, admission queues and the active collection"""
+    return {
+        "collection": read_active_pointer(),
+        "llm_circuit_breakers": breaker_status(),
+        "research_single_flight": research_flight.stats(),
+        "admission": {name: limiter.stats() for name, limiter in admission.items()},
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the semantic answer cache"""
+    if answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
+
 @app.get("/")
 async def root():
     """Root endpoint"""
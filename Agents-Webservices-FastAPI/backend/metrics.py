@@ -0,0 +1,79 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds",
+    "Latency of each pipeline stage.",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+REQUESTS = Counter(
+    "rag_requests_total",
+    "Requests by endpoint and outcome.",
+    ["endpoint", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM provider.",
+    ["kind"],
+)
+RETRIEVED_CHUNKS = Histogram(
+    "rag_retrieved_chunks",
+    "Chunks returned by retrieval per query.",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21),
+)
+
+RERANK_SKIPPED = Counter(
+    "rag_rerank_skipped_total",
+    "Re-ranking passes skipped because they would exceed the latency budget.",
+)
+
+SINGLE_FLIGHT_DEDUPLICATED = Counter(
+    "rag_single_flight_deduplicated_total",
+    "Calls served by joining an identical in-flight computation.",
+    ["operation"],
+)
+
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total",
+    "Requests shed by admission control.",
+    ["endpoint", "reason"],
+)
+
+CASCADE_CALLS = Counter(
+    "llm_cascade_calls_total",
+    "Model cascade calls by endpoint, tier and result (accepted, escalated or error).",
+    ["endpoint", "tier", "result"],
+)
+TIER_TOKENS = Counter(
+    "llm_tier_tokens_total",
+    "Tokens used per cascade tier.",
+    ["tier", "kind"],
+)
+LLM_ESTIMATED_COST = Counter(
+    "llm_estimated_cost_usd_total",
+    "Estimated spend per cascade tier from the configured token prices.",
+    ["tier"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_outcome(endpoint: str, outcome: str):
+    REQUESTS.labels(endpoint, outcome).inc()
+
+
+def record_token_usage(usage_metadata):
+    if not usage_metadata:
+        return
+    LLM_TOKENS.labels("prompt").inc(usage_metadata.get("input_tokens", 0))
+    LLM_TOKENS.labels("completion").inc(usage_metadata.get("output_tokens", 0))
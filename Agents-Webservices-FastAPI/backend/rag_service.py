@@ -1,23 +1,48 @@
-from langchain_openai import ChatOpenAI
-from database import embeddings, collection
+from answer_cache import SemanticAnswerCache
+from cascade import cascade
+from context_assembler import assemble_context
+from database import get_embeddings, pinned_collection
+from executor import run_blocking
+from hybrid_search import get_bm25_index, reciprocal_rank_fusion
+from keywords import IMMIGRATION_KEYWORDS, detect_visa_family
+from llm import astream_with_breaker, get_llm
+from reranker import CrossEncoderReranker
+from resilience import CircuitOpenError
+from metrics import RETRIEVED_CHUNKS, observe_stage, record_outcome
+from settings import app_cfg
+from single_flight import SingleFlight, normalize_query
+from functools import lru_cache
 import os
-from dotenv import load_dotenv
 import yaml
-import time
+import asyncio
+from collections import defaultdict
 
-load_dotenv()
+@lru_cache(maxsize=1)
+def get_prompt_cfg():
+    with open(os.path.join(os.path.dirname(__file__), "config/prompt_config.yaml"), "r") as f:
+        return yaml.safe_load(f)["us_immigration_assistant_cfg"]
 
-# Load prompt config
-with open(os.path.join(os.path.dirname(__file__), "config/prompt_config.yaml"), "r") as f:
-    prompt_cfg = yaml.safe_load(f)["us_immigration_assistant_cfg"]
+llm = get_llm(temperature=0.7)
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.7,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+retrieval_cfg = app_cfg["retrieval"]
+rerank_cfg = retrieval_cfg["rerank"]
+reranker = CrossEncoderReranker(
+    model_name=rerank_cfg["model"],
+    latency_budget_ms=rerank_cfg["latency_budget_ms"],
+    score_cache_size=rerank_cfg["score_cache_size"],
+) if rerank_cfg["enabled"] else None
+
+degradation_cfg = app_cfg["degradation"]
+
+cache_cfg = app_cfg["answer_cache"]
+answer_cache = SemanticAnswerCache(
+    similarity_threshold=cache_cfg["similarity_threshold"],
+    ttl_seconds=cache_cfg["ttl_seconds"],
+    max_entries=cache_cfg["max_entries"],
+) if cache_cfg["enabled"] else None
 
 def build_us_immigration_prompt(context: str, question: str) -> str:
+    prompt_cfg = get_prompt_cfg()
     constraints = "\n".join(f"- {c}" for c in prompt_cfg["output_constraints"])
     style = "\n".join(f"- {s}" for s in prompt_cfg["style_or_tone"])
     prompt = f"""
@@ -30,54 +55,280 @@ Context:\n{prompt_cfg['context']}
 \nResearch Context:\n{context}\n\nUser Question: {question}\n\nAnswer: """
     return prompt
 
-def search_research_db(query: str, top_k: int = 3):
-    query_embedding = embeddings.embed_query(query)
-    results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
-    print(results)
-    # return results
+def search_research_db(query: str, top_k: int = None, query_embedding=None):
+    if query_embedding is None:
+        query_embedding = get_embeddings().embed_query(query)
+    return search_research_db_batch([query], [query_embedding], top_k)[0]
+
+def search_research_db_batch(queries: list, query_embeddings: list, top_k: int = None):
+    """Returns a list of chunk lists in input order, re-ranked when a reranker is configured."""
+    top_k = top_k or retrieval_cfg["top_k"]
+    # One collection version serves the whole lookup, even if a rebuild swaps it meanwhile.
+    with pinned_collection() as collection:
+        if not reranker:
+            return retrieve_candidates(collection, queries, query_embeddings, top_k)
+        candidates = retrieve_candidates(collection, queries, query_embeddings, max(rerank_cfg["candidates"], top_k))
+    return reranker.rerank_batch(queries, candidates, top_k)
+
+def retrieve_candidates(collection, queries: list, query_embeddings: list, top_k: int):
+    """One Chroma round trip for many queries; returns a list of chunk lists in input order.
+
+    `score` is always the vector distance (lower is better), None for chunks found only by
+    BM25. With hybrid retrieval enabled, each query's vector candidates are fused with BM25
+    candidates by reciprocal rank fusion, the result follows the fused ranking and
+    `fused_score` holds the fused score (higher is better).
+    """
+    if not query_embeddings:
+        return []
+    hybrid_cfg = retrieval_cfg["hybrid"]
+    n_candidates = max(hybrid_cfg["candidates"], top_k) if hybrid_cfg["enabled"] else top_k
+    if retrieval_cfg["partition_by_visa_family"]:
+        families = [detect_visa_family(q) for q in queries]
+    else:
+        families = [None] * len(queries)
+    vector_hits = vector_search(collection, query_embeddings, families, n_candidates)
+    if not hybrid_cfg["enabled"]:
+        return vector_hits
+
+    index = get_bm25_index()
+    fused = []
+    for query, family, hits in zip(queries, families, vector_hits):
+        keyword_ids = [chunk_id for chunk_id, _ in index.search(query, n_candidates, family)]
+        ranking = reciprocal_rank_fusion(
+            [[c["id"] for c in hits], keyword_ids],
+            weights=[hybrid_cfg["vector_weight"], hybrid_cfg["bm25_weight"]],
+            k=hybrid_cfg["rrf_k"],
+        )
+        fused.append(({c["id"]: c for c in hits}, ranking[:top_k]))
+
+    # Chunks found only by BM25 are fetched together in one round trip.
+    keyword_only = {chunk_id for by_id, ranking in fused for chunk_id, _ in ranking if chunk_id not in by_id}
+    extra = {}
+    if keyword_only:
+        got = collection.get(ids=list(keyword_only), include=["documents", "metadatas"])
+        extra = {chunk_id: make_chunk(chunk_id, doc, meta, None) for chunk_id, doc, meta in zip(got["ids"], got["documents"], got["metadatas"])}
     return [
-        {
-            "content": doc,
-            "title": results["metadatas"][0][i].get("title", "Unknown"),
-            "score": results["distances"][0][i],
-        }
-        for i, doc in enumerate(results["documents"][0])
+        [{**(by_id.get(chunk_id) or extra[chunk_id]), "fused_score": score} for chunk_id, score in ranking if chunk_id in by_id or chunk_id in extra]
+        for by_id, ranking in fused
     ]
 
-IMMIGRATION_KEYWORDS = [
-    "visa", "green card", "asylum", "citizenship", "immigration", "uscis", "adjustment of status",
-    "naturalization", "deportation", "work permit", "travel ban", "refugee", "DACA", "TPS", "I-94", "I-130",
-    "I-485", "I-140", "I-765", "I-539", "I-601", "I-212", "I-864", "I-129", "I-131", "I-797", "I-9",
-    "EAD", "H-1B", "F-1", "J-1", "EB-1", "EB-2", "EB-3", "EB-5", "E-2", "E-3", "E-1", "L-1", "O-1", "TN",
-    "US immigration", "USCIS", "CBP", "ICE", "consular processing", "removal proceedings"
-]
+def vector_search(collection, query_embeddings: list, families: list, n_results: int):
+    """Queries each visa-family partition once for all the queries routed to it.
+
+    Queries with no detected family use the global index, as do routed queries whose
+    partition returns nothing; `families` is updated in place for those.
+    """
+    hits = [[] for _ in query_embeddings]
+    groups = defaultdict(list)
+    for i, family in enumerate(families):
+        groups[family].append(i)
+    for family, indices in groups.items():
+        results = collection.query(
+            query_embeddings=[query_embeddings[i] for i in indices],
+            n_results=n_results,
+            where={"visa_family": family} if family else None,
+        )
+        for q, i in enumerate(indices):
+            hits[i] = format_chunks(results, q)
+
+    fallback = [i for i, family in enumerate(families) if family and not hits[i]]
+    if fallback:
+        results = collection.query(query_embeddings=[query_embeddings[i] for i in fallback], n_results=n_results)
+        for q, i in enumerate(fallback):
+            hits[i] = format_chunks(results, q)
+            families[i] = None
+    return hits
+
+def make_chunk(chunk_id, doc, metadata, score):
+    metadata = metadata or {}
+    return {
+        "id": chunk_id,
+        "content": doc,
+        "title": metadata.get("title", "Unknown"),
+        "metadata": metadata,
+        "score": score,
+    }
+
+def format_chunks(results, q: int):
+    return [
+        make_chunk(results["ids"][q][i], doc, results["metadatas"][q][i], results["distances"][q][i])
+        for i, doc in enumerate(results["documents"][q])
+    ]
 
 def is_immigration_related(text: str) -> bool:
     text_lower = text.lower()
     return any(kw in text_lower for kw in IMMIGRATION_KEYWORDS)
 
-def call_with_retry(func, max_retries=3, delay=2):
-    for attempt in range(max_retries + 1):
-        try:
-            return func()
-        except Exception as e:
-            if attempt == max_retries:
-                raise e
-            time.sleep(delay * 2 ** attempt)  # Exponential backoff
+OFF_TOPIC_ANSWER = "Sorry, I am an assistant for US immigration topics only. Please ask a question related to US immigration."
+NO_CONTEXT_ANSWER = "I don't have enough information to answer this question."
+LLM_ERROR_ANSWER = "Sorry, there was a problem processing your request. Please try again later."
+DEGRADED_ANSWER_INTRO = "A full answer could not be generated in time. These are the most relevant passages from our sources:"
+
+def retrieval_only_answer(chunks) -> str:
+    """Stands in for the LLM answer when it cannot arrive within the request's latency budget."""
+    passage_chars = degradation_cfg["passage_chars"]
+    passages = []
+    for i, chunk in enumerate(chunks[:degradation_cfg["max_passages"]], start=1):
+        text = " ".join(chunk["content"].split())
+        if len(text) > passage_chars:
+            text = text[:passage_chars].rsplit(" ", 1)[0] + "..."
+        passages.append(f"{i}. {chunk['title']}: {text}")
+    return "\n\n".join([DEGRADED_ANSWER_INTRO] + passages)
 
-def answer_research_question(query: str):
+async def prepare_research_prompt(query: str):
+    """Returns (answer, chunks, prompt, query_embedding).
+
+    `answer` is already set when no LLM call is needed: off-topic questions,
+    cache hits and questions with no matching chunks.
+    """
     if not is_immigration_related(query):
-        return ("Sorry, I am an assistant for US immigration topics only. Please ask a question related to US immigration.", [])
-    chunks = search_research_db(query)
+        record_outcome("research", "off_topic")
+        return OFF_TOPIC_ANSWER, [], None, None
+    with observe_stage("embed_query"):
+        query_embedding = await run_blocking(get_embeddings().embed_query, query)
+    if answer_cache and (cached := answer_cache.lookup(query_embedding, query)):
+        record_outcome("research", "cache_hit")
+        answer, chunks = cached
+        return answer, chunks, None, query_embedding
+    with observe_stage("vector_search"):
+        chunks = await run_blocking(search_research_db, query, query_embedding=query_embedding)
+    RETRIEVED_CHUNKS.observe(len(chunks))
     if not chunks:
-        return ("I don't have enough information to answer this question.", [])
+        record_outcome("research", "no_chunks")
+        return NO_CONTEXT_ANSWER, [], None, query_embedding
+
+    with observe_stage("prompt_build"):
+        prompt = build_research_prompt(chunks, query)
+    return None, chunks, prompt, query_embedding
 
-    context = "\n\n".join([f"From {c['title']}:\n{c['content']}" for c in chunks])
-    prompt = build_us_immigration_prompt(context, query)
-    def call_llm():
-        return llm.invoke(prompt, timeout=30)
+def build_research_prompt(chunks, query: str) -> str:
+    context_cfg = app_cfg["context"]
+    context = assemble_context(
+        chunks,
+        max_tokens=context_cfg["max_tokens"],
+        encoding_name=context_cfg["encoding"],
+        min_overlap_chars=context_cfg["min_overlap_chars"],
+        max_overlap_chars=context_cfg["max_overlap_chars"],
+    )
+    return build_us_immigration_prompt(context, query)
+
+async def generate_answer(prompt: str, query: str, chunks, deadline_seconds: float = None) -> str:
+    """Goes through the model cascade; cheaper tiers' answers must be grounded in the chunks."""
+    context = "\n".join(c["content"] for c in chunks)
+    with observe_stage("llm"):
+        return await cascade.ainvoke(
+            "research", prompt, query, temperature=0.7, context=context, deadline_seconds=deadline_seconds, timeout=30
+        )
+
+research_flight = SingleFlight("answer_research_question")
+
+async def answer_research_question(query: str, budget_seconds: float = None):
+    """Returns (answer, chunks, degraded).
+
+    Concurrent calls with the same normalized question share one computation, and
+    with it the first caller's latency budget.
+    """
+    if not degradation_cfg["enabled"]:
+        budget_seconds = None
+    deadline = None if budget_seconds is None else asyncio.get_running_loop().time() + budget_seconds
+    return await research_flight.do(normalize_query(query), lambda: _answer_research_question(query, deadline))
+
+async def _answer_research_question(query: str, deadline: float = None):
+    answer, chunks, prompt, query_embedding = await prepare_research_prompt(query)
+    if answer:
+        return answer, chunks, False
+    remaining = None if deadline is None else deadline - asyncio.get_running_loop().time()
+    if remaining is not None and remaining < degradation_cfg["min_llm_seconds"]:
+        record_outcome("research", "degraded")
+        return retrieval_only_answer(chunks), chunks, True
+    try:
+        answer = await generate_answer(prompt, query, chunks, remaining)
+    except Exception as e:
+        # Out of budget, or the provider is known to be down: the retrieved passages still help.
+        if degradation_cfg["enabled"] and isinstance(e, (asyncio.TimeoutError, CircuitOpenError)):
+            record_outcome("research", "degraded")
+            return retrieval_only_answer(chunks), chunks, True
+        record_outcome("research", "llm_failure")
+        return LLM_ERROR_ANSWER, [], False
+    record_outcome("research", "success")
+    if answer_cache:
+        answer_cache.store(query_embedding, query, answer, chunks)
+    return answer, chunks, False
+
+async def stream_research_answer(query: str):
+    """Yields ("sources", chunks) first, then ("token", text) pieces as the LLM produces them."""
+    answer, chunks, prompt, query_embedding = await prepare_research_prompt(query)
+    yield "sources", chunks
+    if answer:
+        yield "token", answer
+        return
+    pieces = []
     try:
-        llm_response = call_with_retry(call_llm)
-        return llm_response.content, chunks
+        with observe_stage("llm"):
+            async for piece in astream_with_breaker(llm, prompt, timeout=30):
+                if piece.content:
+                    pieces.append(piece.content)
+                    yield "token", piece.content
     except Exception:
-        return ("Sorry, there was a problem processing your request. Please try again later.", [])
+        record_outcome("research", "llm_failure")
+        yield "error", LLM_ERROR_ANSWER
+        return
+    record_outcome("research", "success")
+    if answer_cache:
+        answer_cache.store(query_embedding, query, "".join(pieces), chunks)
+
+async def answer_research_batch(queries: list, llm_concurrency: int):
+    """Answers many questions with one embedding call, one Chroma query and a capped LLM fan-out.
+
+    Returns one dict per question, in input order, with `answer`, `sources` and `error` keys.
+    """
+    results = [{"question": q, "answer": None, "sources": [], "error": None} for q in queries]
+    on_topic = []
+    for i, query in enumerate(queries):
+        if is_immigration_related(query):
+            on_topic.append(i)
+        else:
+            record_outcome("research_batch", "off_topic")
+            results[i]["answer"] = OFF_TOPIC_ANSWER
+
+    with observe_stage("batch_embed"):
+        query_embeddings = await run_blocking(get_embeddings().embed_documents, [queries[i] for i in on_topic])
+
+    to_retrieve = []
+    for i, query_embedding in zip(on_topic, query_embeddings):
+        if answer_cache and (cached := answer_cache.lookup(query_embedding, queries[i])):
+            record_outcome("research_batch", "cache_hit")
+            results[i]["answer"], results[i]["sources"] = cached
+        else:
+            to_retrieve.append((i, query_embedding))
+
+    with observe_stage("batch_vector_search"):
+        retrieved = await run_blocking(
+            search_research_db_batch, [queries[i] for i, _ in to_retrieve], [e for _, e in to_retrieve]
+        )
+
+    semaphore = asyncio.Semaphore(llm_concurrency)
+
+    async def answer_one(i, query_embedding, chunks):
+        RETRIEVED_CHUNKS.observe(len(chunks))
+        if not chunks:
+            record_outcome("research_batch", "no_chunks")
+            results[i]["answer"] = NO_CONTEXT_ANSWER
+            return
+        async with semaphore:
+            try:
+                answer = await generate_answer(build_research_prompt(chunks, queries[i]), queries[i], chunks)
+            except Exception as e:
+                record_outcome("research_batch", "llm_failure")
+                results[i]["error"] = str(e) or type(e).__name__
+                return
+        record_outcome("research_batch", "success")
+        results[i]["answer"], results[i]["sources"] = answer, chunks
+        if answer_cache:
+            answer_cache.store(query_embedding, queries[i], answer, chunks)
+
+    await asyncio.gather(*(
+        answer_one(i, query_embedding, chunks)
+        for (i, query_embedding), chunks in zip(to_retrieve, retrieved)
+    ))
+    return results
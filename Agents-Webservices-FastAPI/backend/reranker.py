@@ -0,0 +1,79 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import RERANK_SKIPPED, observe_stage
+
+
+class CrossEncoderReranker:
+    """Re-scores retrieved chunks with a small CPU cross-encoder.
+
+    All uncached (query, chunk) pairs of a call are scored in one batched forward pass.
+    Per-pair cost is tracked as a moving average; when scoring the uncached pairs is
+    expected to exceed `latency_budget_ms`, re-ranking is skipped and retrieval order kept.
+    """
+
+    def __init__(self, model_name: str, latency_budget_ms: float = 150, score_cache_size: int = 10000):
+        self.model_name = model_name
+        self.latency_budget_ms = latency_budget_ms
+        self.score_cache_size = score_cache_size
+        self._model = None
+        self._scores = OrderedDict()  # (normalized query, content hash) -> score
+        self._lock = threading.Lock()
+        self.seconds_per_pair = None
+
+    def get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    @staticmethod
+    def _key(query: str, chunk: dict):
+        # Chunk ids are positional and get reused for new text on re-ingest; the content is what was scored.
+        return " ".join(query.lower().split()), hashlib.sha256(chunk["content"].encode("utf-8")).hexdigest()
+
+    def rerank_batch(self, queries: list, chunk_lists: list, top_k: int) -> list:
+        """Returns, for each query, its chunks re-ordered by cross-encoder score and cut to top_k."""
+        with self._lock:
+            cached = {}
+            for query, chunks in zip(queries, chunk_lists):
+                for chunk in chunks:
+                    key = self._key(query, chunk)
+                    if key in self._scores:
+                        self._scores.move_to_end(key)
+                        cached[key] = self._scores[key]
+        pending = {}
+        for query, chunks in zip(queries, chunk_lists):
+            for chunk in chunks:
+                key = self._key(query, chunk)
+                if key not in cached:
+                    pending[key] = (query, chunk["content"])
+
+        if pending:
+            if self.seconds_per_pair is not None and self.seconds_per_pair * len(pending) * 1000 > self.latency_budget_ms:
+                # Decay the estimate so one slow pass cannot disable re-ranking for good.
+                self.seconds_per_pair *= 0.9
+                RERANK_SKIPPED.inc()
+                return [chunks[:top_k] for chunks in chunk_lists]
+            model = self.get_model()
+            started = time.perf_counter()
+            with observe_stage("rerank"):
+                scores = model.predict(list(pending.values()), batch_size=len(pending))
+            per_pair = (time.perf_counter() - started) / len(pending)
+            self.seconds_per_pair = per_pair if self.seconds_per_pair is None else 0.8 * self.seconds_per_pair + 0.2 * per_pair
+            with self._lock:
+                for key, score in zip(pending, scores):
+                    cached[key] = self._scores[key] = float(score)
+                while len(self._scores) > self.score_cache_size:
+                    self._scores.popitem(last=False)
+
+        reranked = []
+        for query, chunks in zip(queries, chunk_lists):
+            scored = [{**chunk, "rerank_score": cached[self._key(query, chunk)]} for chunk in chunks]
+            scored.sort(key=lambda c: c["rerank_score"], reverse=True)
+            reranked.append(scored[:top_k])
+        return reranked
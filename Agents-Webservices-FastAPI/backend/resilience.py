@@ -0,0 +1,155 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit breaker open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a sliding time window.
+
+    closed: calls pass through and outcomes are recorded.
+    open: calls fail fast with CircuitOpenError until `open_seconds` have passed.
+    half_open: a single probe call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_rate_threshold: float = 0.5, min_calls: int = 10,
+                 window_seconds: float = 60, open_seconds: float = 30):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._outcomes = deque()  # (timestamp, succeeded)
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpenError if the call may not go ahead; returns True if it is the half-open probe."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == "open":
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    raise CircuitOpenError(remaining)
+                self._state = "half_open"
+            if self._state == "half_open":
+                if self._probe_in_flight:
+                    raise CircuitOpenError(self.open_seconds)
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == "half_open":
+                self._state = "closed"
+                self._probe_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def release_probe(self):
+        """Ends a probe that produced no verdict on the dependency, e.g. one that was cancelled.
+
+        The circuit stays half-open and the next call becomes the probe.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == "half_open":
+                self._trip(now)
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            if len(self._outcomes) >= self.min_calls and self._failure_rate() >= self.failure_rate_threshold:
+                self._trip(now)
+
+    def _trip(self, now: float):
+        self._state = "open"
+        self._opened_at = now
+        self._probe_in_flight = False
+
+    def status(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            return {
+                "state": self._state,
+                "calls_in_window": len(self._outcomes),
+                "failure_rate": round(self._failure_rate(), 3),
+                "failure_rate_threshold": self.failure_rate_threshold,
+                "retry_after_seconds": round(max(self._opened_at + self.open_seconds - now, 0.0), 1) if self._state == "open" else 0.0,
+            }
+
+
+async def call_with_retry(func, breaker: CircuitBreaker = None, max_retries: int = 3,
+                          base_delay: float = 1.0, max_delay: float = 8.0, deadline_seconds: float = 45,
+                          is_transient=None):
+    """Awaits `func()` with full-jitter exponential backoff, bounded by an overall deadline.
+
+    Raises asyncio.TimeoutError when the deadline passes and CircuitOpenError without
+    retrying when the breaker refuses the call. Only failures of `func` itself are
+    recorded on the breaker, not calls cut short by the deadline. When `is_transient`
+    is given, exceptions it rejects (e.g. a bad request) are raised at once and not
+    recorded; otherwise every exception is retried.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_seconds
+    for attempt in range(max_retries + 1):
+        # Checked before before_call(), which may claim the half-open probe.
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Request deadline exceeded")
+        probe = breaker.before_call() if breaker else False
+        try:
+            result = await asyncio.wait_for(func(), timeout=remaining)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError) and loop.time() >= deadline:
+                # Cut off by the caller's deadline, which says nothing about the dependency's health;
+                # its own timeouts (e.g. the HTTP client's) surface as other exceptions and count below.
+                if probe:
+                    breaker.release_probe()
+                raise
+            if is_transient is not None and not is_transient(e):
+                # The caller's fault, not the dependency's: retrying would fail the same way.
+                if probe:
+                    breaker.release_probe()
+                raise
+            if breaker:
+                breaker.record_failure()
+            backoff = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if attempt == max_retries or loop.time() + backoff >= deadline:
+                raise
+            await asyncio.sleep(backoff)
+        except BaseException:
+            # Cancelled (e.g. the client went away): no verdict, but never keep the probe slot.
+            if probe:
+                breaker.release_probe()
+            raise
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
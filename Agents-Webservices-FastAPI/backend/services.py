@@ -1,22 +1,141 @@
-import os
+import asyncio
+import logging
 
-from dotenv import load_dotenv
-from langchain_community.chat_models import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
 
-load_dotenv()
+from cascade import cascade
+from context_assembler import get_encoding
+from executor import run_blocking
+from llm import ainvoke_with_retry, astream_with_breaker, get_llm
+from metrics import observe_stage
+from sessions import SessionStore, default_db_path
+from settings import app_cfg
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.3,
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+llm = get_llm(temperature=0.3)
 
+logger = logging.getLogger(__name__)
 
-def get_ai_response(user_message: str) -> str:
-    messages = [
-        SystemMessage(content="You are a helpful US immigration assistant. Answer the user's questions clearly and concisely."),
-        HumanMessage(content=user_message),
-    ]
-    response = llm.invoke(messages)
-    return response.content
+sessions_cfg = app_cfg["sessions"]
+session_store = SessionStore(default_db_path(sessions_cfg["db_path"]))
+_compactions = {}  # session_id -> running compaction task
+
+
+SYSTEM_PROMPT = "You are a helpful US immigration assistant. Answer the user's questions clearly and concisely."
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a US immigration assistant.
+Keep the facts about the user's situation, the questions asked and the key answers given.
+Be concise: stay well under {max_words} words.
+
+Current summary:
+{summary}
+
+New conversation turns:
+{turns}
+
+Updated summary:"""
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding(sessions_cfg["encoding"]).encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = get_encoding(sessions_cfg["encoding"])
+    tokens = encoding.encode(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def trim_history(history, max_tokens: int) -> list:
+    """The newest turns that fit in `max_tokens`, starting at a user message.
+
+    Compaction normally keeps the history under budget, but it runs in the background
+    and can lag behind or fail; this keeps the prompt bounded either way.
+    """
+    kept, total = [], 0
+    for message in reversed(history):
+        total += message[3]
+        if total > max_tokens:
+            break
+        kept.append(message)
+    kept.reverse()
+    while kept and kept[0][1] != "user":
+        kept.pop(0)
+    return kept
+
+
+def build_messages(user_message: str, summary: str = "", history=()):
+    system_prompt = SYSTEM_PROMPT
+    if summary:
+        system_prompt += f"\n\nSummary of the earlier conversation:\n{summary}"
+    messages = [SystemMessage(content=system_prompt)]
+    for _, role, content, _ in history:
+        messages.append(HumanMessage(content=content) if role == "user" else AIMessage(content=content))
+    messages.append(HumanMessage(content=user_message))
+    return messages
+
+
+async def load_session_messages(user_message: str, session_id: str = None):
+    if session_id is None:
+        return build_messages(user_message)
+    summary, history = await run_blocking(session_store.load, session_id)
+    if summary:
+        summary = truncate_tokens(summary, sessions_cfg["summary_max_tokens"])
+    return build_messages(user_message, summary, trim_history(history, sessions_cfg["history_max_tokens"]))
+
+
+async def remember_turn(session_id: str, user_message: str, answer: str):
+    turns = [("user", user_message, count_tokens(user_message)), ("assistant", answer, count_tokens(answer))]
+    await run_blocking(session_store.append, session_id, turns)
+    if session_id not in _compactions:
+        _compactions[session_id] = asyncio.create_task(compact_session(session_id))
+
+
+async def compact_session(session_id: str):
+    """Folds the oldest turns into the rolling summary once the verbatim history exceeds its token budget.
+
+    Only the previous summary and the turns being folded are sent to the LLM, so the cost of
+    an update does not grow with the length of the conversation.
+    """
+    try:
+        summary, history = await run_blocking(session_store.load, session_id)
+        total = sum(tokens for *_, tokens in history)
+        if total <= sessions_cfg["history_max_tokens"]:
+            return
+        folded = []
+        for message in history:
+            if total <= sessions_cfg["compact_to_tokens"]:
+                break
+            folded.append(message)
+            total -= message[3]
+        turns = "\n".join(f"{role}: {content}" for _, role, content, _ in folded)
+        max_tokens = sessions_cfg["summary_max_tokens"]
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", turns=turns, max_words=max_tokens * 3 // 4)
+        with observe_stage("session_summary"):
+            response = await ainvoke_with_retry(llm, prompt, max_tokens=max_tokens)
+        await run_blocking(session_store.save_summary, session_id, response.content, folded[-1][0])
+    except Exception:
+        # The verbatim history is still intact; the next turn retries the compaction.
+        logger.exception("Compacting session %s failed", session_id)
+    finally:
+        _compactions.pop(session_id, None)
+
+
+async def get_ai_response(user_message: str, session_id: str = None) -> str:
+    messages = await load_session_messages(user_message, session_id)
+    with observe_stage("chat_llm"):
+        answer = await cascade.ainvoke("chat", messages, user_message, temperature=0.3)
+    if session_id is not None:
+        await remember_turn(session_id, user_message, answer)
+    return answer
+
+
+async def stream_ai_response(user_message: str, session_id: str = None):
+    messages = await load_session_messages(user_message, session_id)
+    pieces = []
+    with observe_stage("chat_llm"):
+        async for piece in astream_with_breaker(llm, messages):
+            if piece.content:
+                pieces.append(piece.content)
+                yield piece.content
+    if session_id is not None:
+        await remember_turn(session_id, user_message, "".join(pieces))
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+
+class SessionStore:
+    """SQLite-backed chat sessions: a rolling summary plus the turns not yet folded into it."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '',"
+                " summarized_upto INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,"
+                " role TEXT NOT NULL, content TEXT NOT NULL, tokens INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def load(self, session_id: str):
+        """Returns (summary, [(message_id, role, content, tokens)]) for the turns after the summary."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT summary, summarized_upto FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            summary, summarized_upto = row if row else ("", 0)
+            messages = conn.execute(
+                "SELECT id, role, content, tokens FROM messages WHERE session_id = ? AND id > ? ORDER BY id",
+                (session_id, summarized_upto),
+            ).fetchall()
+        return summary, messages
+
+    def append(self, session_id: str, turns: list):
+        """Stores (role, content, tokens) turns, creating the session on first use."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO sessions (id, updated_at) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, now),
+            )
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, role, content, tokens, now) for role, content, tokens in turns],
+            )
+
+    def save_summary(self, session_id: str, summary: str, summarized_upto: int):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE sessions SET summary = ?, summarized_upto = ?, updated_at = ? WHERE id = ?",
+                (summary, summarized_upto, time.time(), session_id),
+            )
+
+    def delete(self, session_id: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+def default_db_path(configured: str) -> str:
+    return configured if os.path.isabs(configured) else os.path.join(os.path.dirname(__file__), configured)
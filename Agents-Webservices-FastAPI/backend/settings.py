@@ -0,0 +1,8 @@
+import os
+import yaml
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "config")
+
+CONFIG_PATH = os.getenv("APP_CONFIG_PATH", os.path.join(CONFIG_DIR, "config.yaml"))
+
+with open(CONFIG_PATH, "r") as f:
+    app_cfg = yaml.safe_load(f)
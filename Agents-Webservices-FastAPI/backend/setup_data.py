@@ -1,30 +1,345 @@
-import json, os
-from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from database import collection, DOCS_DIR
+import argparse, fcntl, glob, hashlib, json, os, re, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from chunking import file_fingerprint, json_to_document, load_and_split, split_documents
+from database import (
+    get_client, get_collection, get_embeddings, bm25_index_path, is_pinned, read_active_pointer, write_active_pointer,
+    CHROMA_PATH, COLLECTION_NAME, DOCS_DIR, bump_ingest_generation,
+)
+from hybrid_search import BM25Index
+from settings import app_cfg
 
-def safe_load_json(path):
-    for enc in ("utf-8", "latin-1"):
-        try:
-            with open(path, encoding=enc) as f: d = json.load(f); break
-        except UnicodeDecodeError: continue
-    return [Document(page_content=d.get("text",""),
-                     metadata={"title": d.get("title", os.path.basename(path)),
-                               "URL": d.get("URL","")})]
+MANIFEST_PATH = os.path.join(CHROMA_PATH, "ingest_manifest.json")
 
-def ingest_json():
-    print("Ingestion started.")
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    for filename in os.listdir(DOCS_DIR):
-        if not filename.endswith(".json"): continue
-        print(f"Processing {filename}...")
-        chunks = splitter.split_documents(safe_load_json(os.path.join(DOCS_DIR, filename)))
-        collection.add(
-            documents=[c.page_content for c in chunks],
-            metadatas=[{**c.metadata, "chunk": i} for i, c in enumerate(chunks)],
-            ids=[f"{filename}_{i}" for i in range(len(chunks))]
+class IngestLock:
+    """Serialises ingestion across threads and across processes (CLI runs and the API's jobs).
+
+    Re-entrant within a thread; the outermost acquisition holds an exclusive flock on `path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a")
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except BaseException:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._rlock.release()
+
+# The collection, manifests and BM25 index are shared by every ingestion path.
+ingest_lock = IngestLock(os.path.join(CHROMA_PATH, "ingest.lock"))
+
+def ingest_root():
+    """Directory that POST /ingest directories must stay inside, and that names synced directories."""
+    return os.path.realpath(app_cfg["ingest"]["directory_root"] or DOCS_DIR)
+
+def source_prefix(docs_dir):
+    """Prefix that keeps chunk ids and `source` metadata unique across synced directories.
+
+    Files in DOCS_DIR keep their bare filename; any other directory is named by its path
+    relative to the ingest root, or its absolute path when it lies outside the root.
+    """
+    docs_dir, root = os.path.realpath(docs_dir), ingest_root()
+    if docs_dir == os.path.realpath(DOCS_DIR):
+        return ""
+    if docs_dir == root:
+        name = os.path.basename(root)
+    elif os.path.commonpath([root, docs_dir]) == root:
+        name = os.path.relpath(docs_dir, root)
+    else:
+        name = docs_dir.lstrip(os.sep)
+    return name.replace(os.sep, "/") + "/"
+
+def manifest_path(docs_dir):
+    """DOCS_DIR keeps the original manifest file; other synced directories get one each."""
+    if os.path.abspath(docs_dir) == os.path.abspath(DOCS_DIR):
+        return MANIFEST_PATH
+    digest = hashlib.sha1(os.path.abspath(docs_dir).encode()).hexdigest()[:12]
+    return os.path.join(CHROMA_PATH, f"ingest_manifest_{digest}.json")
+
+def load_manifest(path=MANIFEST_PATH):
+    """{filename: {"file_hash": str, "chunks": {chunk_id: chunk_hash}}} from the last run."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def split_changed_files(docs_dir, filenames, chunk_size, chunk_overlap, workers):
+    paths = [os.path.join(docs_dir, f) for f in filenames]
+    sources = [source_prefix(docs_dir) + f for f in filenames]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            return list(pool.map(load_and_split, paths, sources, [chunk_size] * len(paths), [chunk_overlap] * len(paths)))
+    return [load_and_split(p, source, chunk_size, chunk_overlap) for p, source in zip(paths, sources)]
+
+def upsert_with_embeddings(chunks, batch_size, progress=None, collection=None):
+    """Embeds chunks with the query-time model in batches and upserts them; returns seconds spent embedding.
+
+    Writes to the active collection unless another is given. `progress(done, total)` is called after every batch.
+    """
+    embeddings, collection = get_embeddings(), collection or get_collection()
+    embed_seconds = 0.0
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        t0 = time.perf_counter()
+        vectors = embeddings.embed_documents([c[1] for c in batch])
+        embed_seconds += time.perf_counter() - t0
+        collection.upsert(
+            ids=[c[0] for c in batch],
+            embeddings=vectors,
+            documents=[c[1] for c in batch],
+            metadatas=[c[2] for c in batch],
         )
+        print(f"Upserted {start + len(batch)}/{len(chunks)} chunks.")
+        if progress:
+            progress(start + len(batch), len(chunks))
+    return embed_seconds
+
+def update_bm25_index(dirty, stale_ids, collection=None):
+    """Applies this run's changes to the persisted BM25 index, building it from the collection if missing."""
+    collection = collection or get_collection()
+    path = bm25_index_path(collection.name)
+    index = BM25Index.load(path)
+    if index is None:
+        index = BM25Index()
+        existing = collection.get(include=["documents", "metadatas"])
+        for chunk_id, doc, metadata in zip(existing["ids"], existing["documents"], existing["metadatas"]):
+            index.add(chunk_id, doc, (metadata or {}).get("visa_family"))
+    else:
+        index.remove(stale_ids)
+        for chunk_id, content, metadata, _ in dirty:
+            index.add(chunk_id, content, metadata.get("visa_family"))
+    index.save(path)
+    return len(index)
+
+def ingest_json(docs_dir=DOCS_DIR, progress=None):
+    """Brings the collection in line with docs_dir, touching only what changed since the last run."""
+    with ingest_lock:
+        return _ingest_json(docs_dir, progress)
+
+def _ingest_json(docs_dir, progress):
+    print("Ingestion started.")
+    started = time.perf_counter()
+    ingest_cfg = app_cfg["ingest"]
+    chunk_size, chunk_overlap = ingest_cfg["chunk_size"], ingest_cfg["chunk_overlap"]
+    path = manifest_path(docs_dir)
+    manifest = load_manifest(path)
+
+    filenames = sorted(f for f in os.listdir(docs_dir) if f.endswith(".json"))
+    file_hashes = {f: file_fingerprint(os.path.join(docs_dir, f), chunk_size, chunk_overlap) for f in filenames}
+    changed = [f for f in filenames if manifest.get(f, {}).get("file_hash") != file_hashes[f]]
+    removed = [f for f in manifest if f not in file_hashes]
+    print(f"{len(filenames) - len(changed)} unchanged, {len(changed)} new or changed, {len(removed)} removed.")
+
+    stale_ids, dirty = [], []
+    split_results = split_changed_files(docs_dir, changed, chunk_size, chunk_overlap, ingest_cfg["workers"])
+    for filename, chunks in zip(changed, split_results):
+        old_chunks = manifest.get(filename, {}).get("chunks", {})
+        file_dirty = [c for c in chunks if old_chunks.get(c[0]) != c[3]]
+        new_ids = {c[0] for c in chunks}
+        stale_ids += [chunk_id for chunk_id in old_chunks if chunk_id not in new_ids]
+        dirty += file_dirty
+        print(f"Processed {filename}: {len(file_dirty)} of {len(chunks)} chunks changed.")
+    split_seconds = time.perf_counter() - started
+
+    embed_seconds = upsert_with_embeddings(dirty, ingest_cfg["embedding_batch_size"], progress)
+    for filename, chunks in zip(changed, split_results):
+        manifest[filename] = {"file_hash": file_hashes[filename], "chunks": {c[0]: c[3] for c in chunks}}
+
+    for filename in removed:
+        stale_ids += list(manifest.pop(filename)["chunks"])
+    if stale_ids:
+        get_collection().delete(ids=stale_ids)
+
+    indexed = update_bm25_index(dirty, stale_ids)
+    print(f"BM25 index covers {indexed} chunks.")
+    save_manifest(manifest, path)
+    if dirty or stale_ids:
+        bump_ingest_generation()
+    report = ingest_report(len(dirty), len(stale_ids), split_seconds, embed_seconds, time.perf_counter() - started)
+    print_ingest_report(report)
+    return report
+
+def ingest_documents(documents, progress=None):
+    """Upserts JSON documents ({"title", "text", "URL", optional "filename"}) given directly.
+
+    Each document replaces every chunk previously stored under the same source filename.
+    """
+    with ingest_lock:
+        started = time.perf_counter()
+        ingest_cfg = app_cfg["ingest"]
+        collection = get_collection()
+        chunks, stale_ids, sources = [], [], []
+        for d in documents:
+            filename = d.get("filename") or f"{d['title'].replace(' ', '_')}.json"
+            new_chunks = split_documents([json_to_document(d, filename)], filename, ingest_cfg["chunk_size"], ingest_cfg["chunk_overlap"])
+            new_ids = {c[0] for c in new_chunks}
+            existing = collection.get(where={"source": filename}, include=[])["ids"]
+            stale_ids += [chunk_id for chunk_id in existing if chunk_id not in new_ids]
+            chunks += new_chunks
+            sources.append(filename)
+        split_seconds = time.perf_counter() - started
+
+        embed_seconds = upsert_with_embeddings(chunks, ingest_cfg["embedding_batch_size"], progress)
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+        update_bm25_index(chunks, stale_ids)
+
+        # The DOCS_DIR manifest no longer describes these sources; forget them so the next sync re-checks them.
+        manifest = load_manifest()
+        if any(manifest.pop(source, None) for source in sources):
+            save_manifest(manifest)
+        bump_ingest_generation()
+        return ingest_report(len(chunks), len(stale_ids), split_seconds, embed_seconds, time.perf_counter() - started)
+
+def rebuild_collection(docs_dir=DOCS_DIR, progress=None):
+    """Re-indexes docs_dir into a new collection version and swaps it in once it passes validation.
+
+    Queries keep reading the current version until the swap; the version it replaces
+    is dropped after it drains (see gc_retired_collections).
+    """
+    with ingest_lock:
+        gc_retired_collections()
+        print("Full rebuild started.")
+        started = time.perf_counter()
+        ingest_cfg = app_cfg["ingest"]
+        chunk_size, chunk_overlap = ingest_cfg["chunk_size"], ingest_cfg["chunk_overlap"]
+        version = next_collection_version()
+        name = f"{COLLECTION_NAME}_v{version}"
+        collection = get_client().create_collection(name, embedding_function=None)
+
+        try:
+            filenames = sorted(f for f in os.listdir(docs_dir) if f.endswith(".json"))
+            split_results = split_changed_files(docs_dir, filenames, chunk_size, chunk_overlap, ingest_cfg["workers"])
+            chunks = [c for file_chunks in split_results for c in file_chunks]
+            split_seconds = time.perf_counter() - started
+            embed_seconds = upsert_with_embeddings(chunks, ingest_cfg["embedding_batch_size"], progress, collection)
+            update_bm25_index(chunks, [], collection)
+            validate_collection(collection)
+        except Exception:
+            get_client().delete_collection(name)
+            if os.path.exists(bm25_index_path(name)):
+                os.remove(bm25_index_path(name))
+            raise
+
+        swap_active_collection(name, version)
+        # Manifests describe the serving collection: the rebuilt directory's is replaced, the rest start over.
+        for path in glob.glob(os.path.join(CHROMA_PATH, "ingest_manifest*.json")):
+            os.remove(path)
+        save_manifest({
+            f: {"file_hash": file_fingerprint(os.path.join(docs_dir, f), chunk_size, chunk_overlap), "chunks": {c[0]: c[3] for c in file_chunks}}
+            for f, file_chunks in zip(filenames, split_results)
+        }, manifest_path(docs_dir))
+        report = ingest_report(len(chunks), 0, split_seconds, embed_seconds, time.perf_counter() - started)
+        report["collection"] = name
+        print_ingest_report(report)
+        return report
+
+def next_collection_version():
+    pattern = re.compile(rf"^{re.escape(COLLECTION_NAME)}_v(\d+)$")
+    names = [getattr(c, "name", c) for c in get_client().list_collections()]
+    versions = [int(m.group(1)) for m in map(pattern.match, names) if m]
+    return max(versions + [read_active_pointer()["version"]]) + 1
+
+def validate_collection(collection):
+    """Raises ValueError unless the new version is big enough and answers the validation queries."""
+    cfg = app_cfg["blue_green"]
+    count, active_count = collection.count(), get_collection().count()
+    if count == 0 or count < cfg["min_chunk_ratio"] * active_count:
+        raise ValueError(f"{collection.name} has {count} chunks, the active collection has {active_count}")
+    queries = cfg["validation_queries"]
+    if not queries:
+        return
+    results = collection.query(
+        query_embeddings=get_embeddings().embed_documents([q["question"] for q in queries]),
+        n_results=cfg["validation_top_k"],
+        include=["metadatas"],
+    )
+    for q, metadatas in zip(queries, results["metadatas"]):
+        sources = [(m or {}).get("source") for m in metadatas]
+        if not sources or (q.get("expected_source") and q["expected_source"] not in sources):
+            raise ValueError(f"Validation query {q['question']!r} returned {sources} from {collection.name}")
+    print(f"{collection.name} passed {len(queries)} validation queries.")
+
+def swap_active_collection(name, version):
+    previous = read_active_pointer()
+    retired = previous["retired"] + [{"name": previous["name"], "retired_at": time.time()}]
+    write_active_pointer({"name": name, "version": version, "retired": retired})
+    bump_ingest_generation()
+    print(f"Active collection is now {name}; {previous['name']} retired.")
+    timer = threading.Timer(app_cfg["blue_green"]["drain_seconds"] + 1, gc_retired_collections)
+    timer.daemon = True
+    timer.start()
+
+def gc_retired_collections():
+    """Drops retired versions once they have drained: past drain_seconds and not pinned by a request in this process."""
+    with ingest_lock:
+        pointer = read_active_pointer()
+        drain_seconds = app_cfg["blue_green"]["drain_seconds"]
+        keep = []
+        for entry in pointer["retired"]:
+            if time.time() - entry["retired_at"] < drain_seconds or is_pinned(entry["name"]):
+                keep.append(entry)
+                continue
+            try:
+                get_client().delete_collection(entry["name"])
+            except Exception as e:  # already gone, e.g. dropped by another process
+                print(f"Could not drop {entry['name']}: {e}")
+            if os.path.exists(bm25_index_path(entry["name"])):
+                os.remove(bm25_index_path(entry["name"]))
+            print(f"Dropped retired collection {entry['name']}.")
+        if len(keep) != len(pointer["retired"]):
+            write_active_pointer({**pointer, "retired": keep})
+
+def ingest_report(upserted, deleted, split_seconds, embed_seconds, total_seconds):
+    return {
+        "chunks_upserted": upserted,
+        "chunks_deleted": deleted,
+        "split_seconds": round(split_seconds, 3),
+        "embed_seconds": round(embed_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "embed_chunks_per_sec": round(upserted / embed_seconds, 1) if embed_seconds else 0.0,
+        "chunks_per_sec": round(upserted / total_seconds, 1) if total_seconds else 0.0,
+    }
+
+def print_ingest_report(report):
     print("Ingestion complete.")
+    print(f"  chunks upserted / deleted: {report['chunks_upserted']} / {report['chunks_deleted']}")
+    print(f"  split: {report['split_seconds']}s, embed: {report['embed_seconds']}s, total: {report['total_seconds']}s")
+    print(f"  throughput: {report['embed_chunks_per_sec']} chunks/sec embedding, {report['chunks_per_sec']} chunks/sec end to end")
 
 if __name__ == "__main__":
-    ingest_json()
+    parser = argparse.ArgumentParser(description="Index DOCS_DIR into the Chroma collection.")
+    parser.add_argument("--rebuild", action="store_true", help="build a new collection version and swap it in")
+    args = parser.parse_args()
+    if args.rebuild:
+        rebuild_collection()
+    else:
+        ingest_json()
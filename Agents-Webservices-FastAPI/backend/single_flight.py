@@ -0,0 +1,34 @@
+import asyncio
+
+from metrics import SINGLE_FLIGHT_DEDUPLICATED
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one in-flight computation.
+
+    Callers await the shared task through asyncio.shield, so a caller that disconnects
+    does not cancel the work the others are waiting on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight = {}
+        self.deduplicated = 0
+
+    async def do(self, key, func):
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+            SINGLE_FLIGHT_DEDUPLICATED.labels(self.name).inc()
+        else:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._in_flight), "deduplicated": self.deduplicated}
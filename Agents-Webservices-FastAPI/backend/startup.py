@@ -0,0 +1,51 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from database import get_collection, get_embeddings, resources_loaded
+from hybrid_search import get_bm25_index
+from rag_service import reranker
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "What is an H-1B visa?"
+
+startup_state = {"ready": False, "error": None, "phase_seconds": {}}
+
+
+@contextmanager
+def startup_phase(name: str):
+    started = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started
+    startup_state["phase_seconds"][name] = round(elapsed, 3)
+    logger.info("Startup phase %s took %.3fs", name, elapsed)
+
+
+def warm_up():
+    """Loads the embedding model and collection, then runs one embedding and one query through them."""
+    try:
+        with startup_phase("load_embedding_model"):
+            embeddings = get_embeddings()
+        with startup_phase("open_collection"):
+            collection = get_collection()
+        with startup_phase("load_bm25_index"):
+            get_bm25_index()
+        with startup_phase("warmup_embedding"):
+            query_embedding = embeddings.embed_query(WARMUP_QUERY)
+        with startup_phase("warmup_query"):
+            results = collection.query(query_embeddings=[query_embedding], n_results=1)
+        if reranker:
+            with startup_phase("warmup_reranker"):
+                reranker.get_model()
+                warmup_chunks = [{"id": chunk_id, "content": doc} for chunk_id, doc in zip(results["ids"][0], results["documents"][0])]
+                reranker.rerank_batch([WARMUP_QUERY], [warmup_chunks], top_k=1)
+    except Exception as e:
+        logger.exception("Startup warmup failed")
+        startup_state["error"] = str(e)
+        return
+    startup_state["ready"] = True
+
+
+def readiness() -> dict:
+    return {**startup_state, **resources_loaded()}
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def controller(max_concurrent=1, max_queue=2, max_wait_seconds=1.0):
+    return AdmissionController("test", max_concurrent, max_queue, max_wait_seconds)
+
+
+def test_admits_immediately_below_capacity():
+    async def scenario():
+        limiter = controller(max_concurrent=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 2
+    assert stats["queued"] == 0
+
+
+def test_release_hands_slot_to_lowest_priority_value_first():
+    async def scenario():
+        limiter = controller(max_concurrent=1, max_queue=3)
+        await limiter.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter("low", 5)), asyncio.create_task(waiter("high", 0))]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["high", "low"]
+    assert stats["active"] == 1
+    assert stats["queued"] == 0
+
+
+def test_rejects_with_429_when_queue_full():
+    async def scenario():
+        limiter = controller(max_concurrent=1, max_queue=1)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await limiter.acquire()
+        limiter.release()
+        await queued
+        return excinfo.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.reason == "queue_full"
+    assert rejected.retry_after >= 1.0
+
+
+def test_rejects_with_503_when_expected_wait_exceeds_budget():
+    async def scenario():
+        limiter = controller(max_concurrent=1, max_queue=5, max_wait_seconds=10.0)
+        limiter.record_service_time(2.0)
+        await limiter.acquire()
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await limiter.acquire(wait_budget=1.0)
+        return excinfo.value, limiter.stats()
+
+    rejected, stats = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.reason == "deadline"
+    assert stats["queued"] == 0
+
+
+def test_queued_request_times_out_with_503():
+    async def scenario():
+        limiter = controller(max_concurrent=1, max_wait_seconds=0.05)
+        await limiter.acquire()
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await limiter.acquire()
+        return excinfo.value, limiter.stats()
+
+    rejected, stats = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.reason == "queue_timeout"
+    assert stats["active"] == 1
+    assert stats["queued"] == 0
+
+
+def test_cancelled_waiter_does_not_consume_a_slot():
+    async def scenario():
+        limiter = controller(max_concurrent=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+
+
+def test_slot_releases_on_exception():
+    async def scenario():
+        limiter = controller()
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("boom")
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from answer_cache import SemanticAnswerCache, query_identifiers
+
+
+def test_query_identifiers_ignore_case_and_hyphens():
+    assert query_identifiers("Fee for Form I-485?") == query_identifiers("fee for i485")
+    assert query_identifiers("H-1B processing time") == frozenset({"h1b"})
+
+
+def test_query_identifiers_fall_back_to_visa_family():
+    assert query_identifiers("Who qualifies for asylum?") == frozenset({"family:asylum"})
+    assert query_identifiers("What is a green card?") == frozenset()
+
+
+def test_similar_queries_with_different_forms_miss():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store([1.0, 0.0], "What is the fee for Form I-130?", "I-130 answer", [])
+    assert cache.lookup([1.0, 0.01], "What is the fee for Form I-131?") is None
+    assert cache.lookup([1.0, 0.01], "What's the fee for form i130?") == ("I-130 answer", [])
+
+
+def test_dissimilar_queries_miss():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store([1.0, 0.0], "I-130 fee", "answer", [])
+    assert cache.lookup([0.0, 1.0], "I-130 fee") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from context_assembler import assemble_context, get_encoding, overlap_length, stitch_passages
+
+
+def chunk(source, index, content):
+    return {"title": source, "content": content, "metadata": {"source": source, "chunk": index}}
+
+
+def test_overlap_length_respects_bounds():
+    assert overlap_length("abcdef", "defghi", 2, 10) == 3
+    assert overlap_length("abcdef", "defghi", 4, 10) == 0
+    assert overlap_length("abcdef", "defghi", 1, 2) == 0
+
+
+def test_stitches_neighbours_and_drops_shared_text():
+    chunks = [chunk("a.txt", 1, "the fee is due at filing time"), chunk("a.txt", 0, "Form I-130 costs money; the fee is due")]
+    passages = stitch_passages(chunks, min_overlap_chars=5, max_overlap_chars=100)
+    assert passages == [("a.txt", "Form I-130 costs money; the fee is due at filing time")]
+
+
+def test_keeps_non_neighbours_apart_in_rank_order():
+    chunks = [chunk("b.txt", 5, "second doc"), chunk("a.txt", 0, "first"), chunk("a.txt", 2, "third")]
+    passages = stitch_passages(chunks, min_overlap_chars=5, max_overlap_chars=100)
+    assert passages == [("b.txt", "second doc"), ("a.txt", "first"), ("a.txt", "third")]
+
+
+def test_neighbours_without_overlap_are_joined_by_newline():
+    chunks = [chunk("a.txt", 0, "alpha"), chunk("a.txt", 1, "beta")]
+    assert stitch_passages(chunks, 5, 100) == [("a.txt", "alpha\nbeta")]
+
+
+def test_assemble_context_fits_budget_and_cuts_last_passage():
+    chunks = [chunk("a.txt", 0, "short passage"), chunk("b.txt", 0, "word " * 200)]
+    context = assemble_context(chunks, max_tokens=40)
+    assert context.startswith("From a.txt:\nshort passage\n\nFrom b.txt:")
+    assert len(get_encoding("o200k_base").encode(context)) <= 40
+
+
+def test_assemble_context_includes_everything_under_budget():
+    chunks = [chunk("a.txt", 0, "one"), chunk("b.txt", 0, "two")]
+    assert assemble_context(chunks, max_tokens=1000) == "From a.txt:\none\n\nFrom b.txt:\ntwo"
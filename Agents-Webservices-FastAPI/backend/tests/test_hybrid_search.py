@@ -0,0 +1,54 @@
+import pytest
+
+from hybrid_search import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def index():
+    bm25 = BM25Index()
+    bm25.add("h1b", "H-1B specialty occupation workers need a sponsoring employer", family="H/L")
+    bm25.add("f1", "F-1 students may work on campus during the academic year", family="F/J")
+    bm25.add("fees", "Filing fees for every form are listed on the fee schedule")
+    return bm25
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Form I-765 for H-1B") == ["form", "i-765", "i", "765", "for", "h-1b", "h", "1b"]
+
+
+def test_search_ranks_matching_chunk_first():
+    results = index().search("h-1b employer", k=3)
+    assert results[0][0] == "h1b"
+    assert all(score > 0 for _, score in results)
+
+
+def test_search_family_filter_keeps_untagged_chunks():
+    ids = [chunk_id for chunk_id, _ in index().search("students work form fees", k=10, family="H/L")]
+    assert "f1" not in ids
+    assert "fees" in ids
+
+
+def test_remove_drops_chunk_from_results():
+    bm25 = index()
+    bm25.remove(["h1b"])
+    assert "h1b" not in [chunk_id for chunk_id, _ in bm25.search("h-1b", k=3)]
+    assert len(bm25) == 2
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "bm25" / "index.json")
+    index().save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("campus", k=1) == index().search("campus", k=1)
+    assert loaded.doc_families["f1"] == "F/J"
+
+
+def test_load_missing_file_returns_none(tmp_path):
+    assert BM25Index.load(str(tmp_path / "missing.json")) is None
+
+
+def test_reciprocal_rank_fusion_sums_weighted_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], weights=[1.0, 2.0], k=60)
+    scores = dict(fused)
+    assert [chunk_id for chunk_id, _ in fused] == ["b", "c", "a"]
+    assert scores["b"] == pytest.approx(1 / 62 + 2 / 61)
+    assert scores["a"] == pytest.approx(1 / 61)
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from ingest_jobs import IngestJobs, IngestQueueFull
+
+
+def wait_for_status(jobs, job_id, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while jobs.get(job_id)["status"] != status:
+        assert time.monotonic() < deadline, jobs.get(job_id)
+        time.sleep(0.005)
+
+
+def test_job_reports_progress_and_result():
+    jobs = IngestJobs()
+
+    def work(progress, n):
+        progress(n, n)
+        return {"chunks_upserted": n}
+
+    job_id = jobs.submit(work, n=3)
+    wait_for_status(jobs, job_id, "succeeded")
+    job = jobs.get(job_id)
+    assert job["processed_chunks"] == 3
+    assert job["report"] == {"chunks_upserted": 3}
+    jobs.shutdown()
+
+
+def test_failed_job_keeps_error():
+    jobs = IngestJobs()
+
+    def work(progress):
+        raise ValueError("bad document")
+
+    job_id = jobs.submit(work)
+    wait_for_status(jobs, job_id, "failed")
+    assert jobs.get(job_id)["error"] == "bad document"
+    jobs.shutdown()
+
+
+def test_running_jobs_are_not_evicted_and_pending_jobs_are_capped():
+    jobs = IngestJobs(max_workers=1, max_jobs=1, max_pending=2)
+    release = threading.Event()
+    running = jobs.submit(lambda progress: release.wait())
+    queued = jobs.submit(lambda progress: None)
+    with pytest.raises(IngestQueueFull):
+        jobs.submit(lambda progress: None)
+    assert jobs.get(running) is not None
+    assert jobs.get(queued)["status"] == "queued"
+
+    release.set()
+    wait_for_status(jobs, queued, "succeeded")
+    latest = jobs.submit(lambda progress: None)
+    wait_for_status(jobs, latest, "succeeded")
+    jobs.submit(lambda progress: None)
+    # Only the newest finished job is remembered once another one is submitted.
+    assert jobs.get(running) is None
+    assert jobs.get(latest) is not None
+    jobs.shutdown()
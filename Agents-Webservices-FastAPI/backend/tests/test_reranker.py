@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from reranker import CrossEncoderReranker
+
+
+class CountingModel:
+    def __init__(self):
+        self.pairs = []
+
+    def predict(self, pairs, batch_size):
+        self.pairs.extend(pairs)
+        return [float(len(content)) for _, content in pairs]
+
+
+def reranker_with(model):
+    reranker = CrossEncoderReranker("test-model", latency_budget_ms=1e9)
+    reranker._model = model
+    return reranker
+
+
+def test_orders_by_score_and_cuts_to_top_k():
+    reranker = reranker_with(CountingModel())
+    chunks = [{"id": "a", "content": "x"}, {"id": "b", "content": "xxx"}, {"id": "c", "content": "xx"}]
+    [ranked] = reranker.rerank_batch(["q"], [chunks], top_k=2)
+    assert [c["id"] for c in ranked] == ["b", "c"]
+
+
+def test_cached_scores_are_reused():
+    model = CountingModel()
+    reranker = reranker_with(model)
+    chunks = [{"id": "a", "content": "x"}]
+    reranker.rerank_batch(["What is I-130?"], [chunks], top_k=1)
+    reranker.rerank_batch(["what is  i-130?"], [chunks], top_k=1)
+    assert len(model.pairs) == 1
+
+
+def test_reused_chunk_id_with_new_content_is_rescored():
+    model = CountingModel()
+    reranker = reranker_with(model)
+    reranker.rerank_batch(["q"], [[{"id": "doc_0", "content": "old text"}]], top_k=1)
+    [ranked] = reranker.rerank_batch(["q"], [[{"id": "doc_0", "content": "new"}]], top_k=1)
+    assert len(model.pairs) == 2
+    assert ranked[0]["rerank_score"] == 3.0
@@ -0,0 +1,198 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, call_with_retry
+
+
+def open_breaker(open_seconds=0.01):
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=2, window_seconds=60, open_seconds=open_seconds)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def half_open_breaker():
+    breaker = open_breaker()
+    time.sleep(0.02)
+    return breaker
+
+
+def test_stays_closed_below_min_calls():
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.status()["state"] == "closed"
+    assert breaker.before_call() is False
+
+
+def test_trips_when_failure_rate_reaches_threshold():
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=4)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.status()["state"] == "closed"
+    breaker.record_failure()
+    assert breaker.status()["state"] == "open"
+
+
+def test_open_rejects_calls():
+    breaker = open_breaker(open_seconds=30)
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert 0 < excinfo.value.retry_after <= 30
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = half_open_breaker()
+    assert breaker.before_call() is True
+    assert breaker.status()["state"] == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_probe_success_closes_and_forgets_old_failures():
+    breaker = half_open_breaker()
+    breaker.before_call()
+    breaker.record_success()
+    status = breaker.status()
+    assert status["state"] == "closed"
+    assert status["calls_in_window"] == 1
+    assert status["failure_rate"] == 0
+
+
+def test_probe_failure_reopens():
+    breaker = half_open_breaker()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.status()["state"] == "open"
+
+
+def test_released_probe_can_be_retried():
+    breaker = half_open_breaker()
+    breaker.before_call()
+    breaker.release_probe()
+    assert breaker.status()["state"] == "half_open"
+    assert breaker.before_call() is True
+
+
+def test_call_with_retry_retries_then_succeeds():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ValueError("boom")
+        return "ok"
+
+    breaker = CircuitBreaker(min_calls=100)
+    result = asyncio.run(call_with_retry(flaky, breaker, max_retries=3, base_delay=0.001, max_delay=0.001))
+    assert result == "ok"
+    assert len(calls) == 3
+
+
+def test_call_with_retry_does_not_retry_open_circuit():
+    calls = []
+
+    async def func():
+        calls.append(1)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_retry(func, open_breaker(open_seconds=30), max_retries=3))
+    assert calls == []
+
+
+def test_expired_deadline_does_not_claim_the_probe():
+    breaker = half_open_breaker()
+
+    async def func():
+        return "ok"
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_retry(func, breaker, deadline_seconds=0))
+    assert breaker.before_call() is True
+
+
+def test_cancelled_probe_is_released():
+    breaker = half_open_breaker()
+
+    async def main():
+        task = asyncio.ensure_future(call_with_retry(lambda: asyncio.sleep(10), breaker))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert breaker.status()["state"] == "half_open"
+    assert breaker.before_call() is True
+
+
+def test_deadline_cut_off_is_not_a_failure():
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=1)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_retry(lambda: asyncio.sleep(10), breaker, deadline_seconds=0.01))
+    status = breaker.status()
+    assert status["state"] == "closed"
+    assert status["calls_in_window"] == 0
+
+
+def test_deadline_cut_off_releases_the_probe():
+    breaker = half_open_breaker()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_retry(lambda: asyncio.sleep(10), breaker, deadline_seconds=0.01))
+    assert breaker.before_call() is True
+
+
+def test_dependency_timeout_counts_as_failure():
+    async def times_out():
+        raise TimeoutError("provider timed out")
+
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=1)
+    with pytest.raises(TimeoutError):
+        asyncio.run(call_with_retry(times_out, breaker, max_retries=0))
+    assert breaker.status()["state"] == "open"
+
+
+def test_non_transient_error_is_neither_retried_nor_recorded():
+    calls = 0
+
+    async def bad_request():
+        nonlocal calls
+        calls += 1
+        raise ValueError("bad request")
+
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=1)
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retry(bad_request, breaker, base_delay=0,
+                                    is_transient=lambda e: isinstance(e, ConnectionError)))
+    assert calls == 1
+    assert breaker.status()["calls_in_window"] == 0
+
+
+def test_transient_error_is_retried_and_recorded():
+    calls = 0
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        raise ConnectionError("reset")
+
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=10)
+    with pytest.raises(ConnectionError):
+        asyncio.run(call_with_retry(flaky, breaker, max_retries=2, base_delay=0,
+                                    is_transient=lambda e: isinstance(e, ConnectionError)))
+    assert calls == 3
+    assert breaker.status()["calls_in_window"] == 3
+
+
+def test_non_transient_error_releases_the_probe():
+    async def bad_request():
+        raise ValueError("bad request")
+
+    breaker = half_open_breaker()
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retry(bad_request, breaker, is_transient=lambda e: False))
+    assert breaker.status()["state"] == "half_open"
+    assert breaker.before_call() is True
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from single_flight import SingleFlight, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What is  an I-94? ") == "what is an i-94"
+
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("key", compute) for _ in range(3)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["answer"] * 3
+    assert calls == 1
+    assert stats == {"in_flight": 0, "deduplicated": 2}
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def compute(value):
+            await asyncio.sleep(0)
+            return value
+
+        return await asyncio.gather(flight.do("a", lambda: compute(1)), flight.do("b", lambda: compute(2)))
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_error_reaches_every_caller_and_key_is_freed():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        return results, flight.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert stats["in_flight"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def scenario():
+        flight = SingleFlight("test")
+        done = asyncio.Event()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            done.set()
+            return "answer"
+
+        first = asyncio.create_task(flight.do("key", compute))
+        second = asyncio.create_task(flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, done.is_set()
+
+    assert asyncio.run(scenario()) == ("answer", True)
@@ -8,22 +8,47 @@ using Streamlit's powerful UI components and session state management.
 
 import streamlit as st
 import os
+import json
+import uuid
 import requests
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# FastAPI backend endpoint
+# FastAPI backend endpoints
 API_URL = os.getenv("API_URL", "http://localhost:8000/chat")
-
-def get_ai_response(user_message: str) -> str:
+RESEARCH_API_URL = os.getenv("RESEARCH_API_URL", "http://localhost:8000/research")
+
+def iter_sse_events(res):
+    """Parse a server-sent event stream into (event, data) pairs."""
+    event, data = "message", []
+    for line in res.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+def stream_ai_response(url: str, payload: dict, sources: list):
+    """Yield answer tokens from a streaming endpoint; sources are collected into `sources`."""
     try:
-        res = requests.post(API_URL, json={"message": user_message})
-        res.raise_for_status()
-        return res.json().get("response", "⚠️ No response from backend.")
+        with requests.post(f"{url.rstrip('/')}/stream", json=payload, stream=True) as res:
+            res.raise_for_status()
+            for event, data in iter_sse_events(res):
+                if event == "sources":
+                    sources.extend(data)
+                elif event == "token":
+                    yield data["text"]
+                elif event == "error":
+                    st.error(f"❌ {data['detail']}")
+                elif event == "done":
+                    break
     except requests.RequestException as e:
         st.error(f"❌ API call failed: {e}")
-        return "⚠️ Something went wrong! Please try again later."
+        yield "⚠️ Something went wrong! Please try again later."
 
 def main():
     # Page configuration
@@ -38,15 +63,19 @@ def main():
     st.title("🤖 AI Chatbot Assistant")
     st.markdown("Ask me anything and I'll help you with intelligent responses!")
 
-    # Initialize chat history in session state
+    # Initialize chat history in session state; the backend keeps the conversation under session_id
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
 
     # Display chat messages from history on app rerun
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
+    research_mode = st.sidebar.toggle("📚 Research mode (cite sources)", value=False)
+
     # Accept user input
     if prompt := st.chat_input("What would you like to know?"):
         st.session_state.messages.append({"role": "user", "content": prompt})
@@ -55,9 +84,17 @@ def main():
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = get_ai_response(prompt)
-            st.markdown(response)
+            sources = []
+            if research_mode:
+                tokens = stream_ai_response(RESEARCH_API_URL, {"question": prompt}, sources)
+            else:
+                tokens = stream_ai_response(API_URL, {"message": prompt, "session_id": st.session_state.session_id}, sources)
+            response = st.write_stream(tokens)
+            if sources:
+                with st.expander("Sources"):
+                    for source in sources:
+                        distance = "keyword match" if source["score"] is None else f"distance {source['score']:.3f}"
+                        st.markdown(f"**{source['title']}** ({distance})\n\n{source['content']}")
 
         st.session_state.messages.append({"role": "assistant", "content": response})
 
@@ -73,7 +110,12 @@ def main():
         st.markdown("### Chat Controls")
 
         if st.button("🗑️ Clear Chat History", use_container_width=True):
+            try:
+                requests.delete(f"{API_URL.rsplit('/chat', 1)[0]}/sessions/{st.session_state.session_id}")
+            except requests.RequestException:
+                pass
             st.session_state.messages = []
+            st.session_state.session_id = str(uuid.uuid4())
             st.rerun()
 
         st.markdown("---")
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Callable, Optional
+
+from paths import APP_CONFIG_FPATH, EMBEDDING_CACHE_FPATH
+from utils import load_yaml_config
+
+
+def normalize_text(text: str) -> str:
+    """Collapses runs of whitespace.
+
+    The sentence-transformers tokenizers split on whitespace, so this never changes
+    the embedding; it only lets re-wrapped text hit the cache.
+    """
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings persisted in SQLite, keyed by (model name, normalised text hash).
+
+    Holds at most max_entries vectors; the least recently used are evicted first.
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_FPATH, max_entries: int = 500_000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def embed(
+        self,
+        model_name: str,
+        texts: list[str],
+        embed_fn: Callable[[list[str]], list[list[float]]],
+    ) -> list[list[float]]:
+        """Returns one embedding per text, calling embed_fn only for texts not in the cache.
+
+        Args:
+            model_name: Name of the model the vectors come from.
+            texts: Texts to embed.
+            embed_fn: Embeds a list of texts; called at most once, with each missing text once.
+
+        Returns:
+            Embeddings in the order of texts.
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = self._get_many(model_name, set(hashes))
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in found:
+                missing.setdefault(h, text)
+
+        misses = sum(h not in found for h in hashes)
+        with self._lock:
+            self.hits += len(texts) - misses
+            self.misses += misses
+
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            new = dict(zip(missing, vectors))
+            self._put_many(model_name, new)
+            found.update(new)
+        return [found[h] for h in hashes]
+
+    def _get_many(self, model_name: str, hashes: set) -> dict:
+        found = {}
+        hashes = list(hashes)
+        now = time.time()
+        with self._lock:
+            # Stay under SQLite's limit on bound parameters.
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model_name, h) for h in found],
+            )
+            self._conn.commit()
+        return found
+
+    def _put_many(self, model_name: str, vectors: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model_name, h, array("f", vector).tobytes(), now) for h, vector in vectors.items()],
+            )
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Hits and misses since this process started, plus the number of stored vectors."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": self._count(),
+            }
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The process-wide cache configured in config.yaml, or None when it is disabled."""
+    cache_config = load_yaml_config(APP_CONFIG_FPATH).get("embedding_cache", {})
+    if not cache_config.get("enabled", False):
+        return None
+    return EmbeddingCache(max_entries=cache_config["max_entries"])
@@ -0,0 +1,61 @@
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import torch
+from langchain_huggingface import HuggingFaceEmbeddings
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_models: dict[tuple[str, str], HuggingFaceEmbeddings] = {}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def detect_device() -> str:
+    """Picks the best available torch device once per process.
+
+    Returns:
+        "cuda", "mps" or "cpu".
+    """
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def get_embedding_model(
+    model_name: str = DEFAULT_EMBEDDING_MODEL, device: Optional[str] = None
+) -> HuggingFaceEmbeddings:
+    """Returns the shared embedding model for (model_name, device), loading it on first use.
+
+    Args:
+        model_name: Name of the sentence-transformers model.
+        device: Torch device. Defaults to the best available one.
+
+    Returns:
+        The process-wide HuggingFaceEmbeddings instance.
+    """
+    key = (model_name, device or detect_device())
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = HuggingFaceEmbeddings(
+                    model_name=key[0],
+                    model_kwargs={"device": key[1]},
+                )
+                _models[key] = model
+    return model
+
+
+def warmup(model_name: str = DEFAULT_EMBEDDING_MODEL, device: Optional[str] = None) -> None:
+    """Loads the model and runs one embedding so the first real request does not pay for it.
+
+    Args:
+        model_name: Name of the sentence-transformers model.
+        device: Torch device. Defaults to the best available one.
+    """
+    get_embedding_model(model_name, device).embed_query("warmup")
@@ -18,4 +18,6 @@ PUBLICATION_FPATH = os.path.join(DATA_DIR, "publication.md")
 
 VECTOR_DB_DIR = os.path.join(OUTPUTS_DIR, "vector_db")
 
-CHAT_HISTORY_DB_FPATH = os.path.join(OUTPUTS_DIR, "chat_history.db")
\ No newline at end of file
+CHAT_HISTORY_DB_FPATH = os.path.join(OUTPUTS_DIR, "chat_history.db")
+
+EMBEDDING_CACHE_FPATH = os.path.join(OUTPUTS_DIR, "embedding_cache.db")
\ No newline at end of file
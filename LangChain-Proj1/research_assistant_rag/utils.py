@@ -44,6 +44,20 @@ def load_all_publications(publication_dir: str = DATA_DIR) -> list[str]:
     return publications
 
 
+def load_publications_by_id(publication_dir: str = DATA_DIR) -> dict[str, str]:
+    """Loads all the publication markdown files in the given directory.
+
+    Returns:
+        Publication contents keyed by publication id (the file name without ".md").
+    """
+    publications = {}
+    for file_name in sorted(os.listdir(publication_dir)):
+        if file_name.endswith(".md"):
+            with open(os.path.join(publication_dir, file_name), "r", encoding="utf-8") as file:
+                publications[file_name[: -len(".md")]] = file.read()
+    return publications
+
+
 def load_yaml_config(file_path: Union[str, Path]) -> dict:
     """Loads a YAML configuration file.
 
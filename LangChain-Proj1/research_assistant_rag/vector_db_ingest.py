@@ -1,11 +1,19 @@
+import argparse
+import hashlib
 import os
-import torch
+import queue
+import threading
+import time
 import chromadb
 import shutil
-from paths import VECTOR_DB_DIR
-from langchain_huggingface import HuggingFaceEmbeddings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Optional
+from paths import APP_CONFIG_FPATH, DATA_DIR, VECTOR_DB_DIR
+from embedding_cache import get_embedding_cache
+from embedding_registry import DEFAULT_EMBEDDING_MODEL, get_embedding_model
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from utils import load_all_publications
+from utils import load_publications_by_id, load_yaml_config
 
 
 def initialize_db(
@@ -84,60 +92,310 @@ def chunk_publication(
     return text_splitter.split_text(publication)
 
 
-def embed_documents(documents: list[str]) -> list[list[float]]:
+def embed_documents(
+    documents: list[str], model_name: str = DEFAULT_EMBEDDING_MODEL
+) -> list[list[float]]:
     """
-    Embed documents using a model.
+    Embed documents using the shared model from the embedding registry.
+
+    With the embedding cache enabled, only documents it has not seen are embedded,
+    and the model is not even loaded when every document is cached.
     """
-    device = (
-        "cuda"
-        if torch.cuda.is_available()
-        else "mps" if torch.backends.mps.is_available() else "cpu"
-    )
-    model = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": device},
+    cache = get_embedding_cache()
+    if cache is None:
+        return get_embedding_model(model_name).embed_documents(documents)
+    return cache.embed(
+        model_name, documents, lambda texts: get_embedding_model(model_name).embed_documents(texts)
     )
 
-    embeddings = model.embed_documents(documents)
-    return embeddings
+def publication_hash(publication: str, chunk_size: int, chunk_overlap: int) -> str:
+    """
+    Fingerprint of a publication's text and the chunking parameters it was split with.
+    """
+    return hashlib.sha256(f"{chunk_size}:{chunk_overlap}:{publication}".encode("utf-8")).hexdigest()
+
+
+def chunk_id(publication_id: str, chunk: str) -> str:
+    """
+    Content-addressed chunk ID: the same text in the same publication always gets the same ID.
+    """
+    return hashlib.sha256(f"{publication_id}\0{chunk}".encode("utf-8")).hexdigest()
+
+
+def chunk_publication_records(
+    publication_id: str, publication: str, chunk_size: int = 1000, chunk_overlap: int = 200
+) -> list[tuple[str, str, dict]]:
+    """
+    Chunk a publication into (chunk_id, chunk, metadata) records; repeated chunks are kept once.
+    """
+    chunks = {}
+    for chunk in chunk_publication(publication, chunk_size, chunk_overlap):
+        chunks.setdefault(chunk_id(publication_id, chunk), chunk)
+    metadata = {
+        "publication_id": publication_id,
+        "publication_hash": publication_hash(publication, chunk_size, chunk_overlap),
+        "publication_chunks": len(chunks),
+    }
+    return [(id, chunk, metadata) for id, chunk in chunks.items()]
+
+
+def get_indexed_publications(collection: chromadb.Collection, page_size: int = 10000) -> dict:
+    """
+    Read what is already indexed, grouped by publication.
+
+    Args:
+        collection (chromadb.Collection): The collection to inspect
+        page_size (int): Records fetched per request
+
+    Returns:
+        dict: {publication_id: {"hash": str | None, "ids": set[str]}}; chunks written
+        before publication ids existed are grouped under None
+    """
+    indexed = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        for id, metadata in zip(page["ids"], page["metadatas"]):
+            metadata = metadata or {}
+            entry = indexed.setdefault(metadata.get("publication_id"), {"versions": set(), "ids": set()})
+            entry["versions"].add((metadata.get("publication_hash"), metadata.get("publication_chunks")))
+            entry["ids"].add(id)
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+    return {publication_id: {"hash": complete_hash(entry), "ids": entry["ids"]} for publication_id, entry in indexed.items()}
+
+
+def complete_hash(entry: dict) -> Optional[str]:
+    """
+    The publication hash if all of its chunks were written by one complete run, else None.
+
+    A run that stopped part-way leaves chunks that disagree on the hash, or fewer
+    chunks than the publication has, so the publication is processed again.
+    """
+    if len(entry["versions"]) != 1:
+        return None
+    pub_hash, chunk_count = next(iter(entry["versions"]))
+    return pub_hash if chunk_count == len(entry["ids"]) else None
+
+
+class StageStats:
+    """Items handled and seconds spent working (not waiting on queues) by one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def add(self, items: int, seconds: float):
+        self.items += items
+        self.busy_seconds += seconds
 
-def insert_publications(collection: chromadb.Collection, publications: list[str]):
+
+def print_throughput_report(stages: list[StageStats], wall_seconds: float, total_chunks: int):
+    """
+    Print items, busy time and throughput per stage; the slowest stage bounds the pipeline.
+    """
+    print(f"{'stage':<8}{'items':>10}{'busy s':>10}{'items/s':>12}")
+    for stage in stages:
+        rate = stage.items / stage.busy_seconds if stage.busy_seconds else 0.0
+        print(f"{stage.name:<8}{stage.items:>10}{stage.busy_seconds:>10.2f}{rate:>12.1f}")
+    rate = total_chunks / wall_seconds if wall_seconds else 0.0
+    print(f"{'total':<8}{total_chunks:>10}{wall_seconds:>10.2f}{rate:>12.1f}  (chunks, wall clock)")
+
+
+def insert_publications_pipelined(
+    collection: chromadb.Collection,
+    publications: dict[str, str],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    workers: int = 4,
+    embed_batch_size: int = 256,
+    queue_size: int = 4,
+    indexed_ids: dict[str, set] = None,
+) -> dict:
     """
-    Insert documents into a ChromaDB collection.
+    Upsert publications with chunking, embedding and writing running concurrently.
+
+    Publications are chunked in a process pool, chunks from consecutive publications
+    are embedded together in batches of embed_batch_size, and a writer thread upserts
+    the embedded batches to Chroma. Bounded queues between the stages keep memory flat.
+
+    For a publication that is already indexed, chunks whose ID is unchanged are not
+    embedded again (only their metadata is updated) and chunks it no longer has are deleted.
 
     Args:
         collection (chromadb.Collection): The collection to insert documents into
-        documents (list[str]): The documents to insert
+        publications (dict[str, str]): Publication contents keyed by publication id
+        chunk_size (int): Characters per chunk
+        chunk_overlap (int): Characters shared by neighbouring chunks
+        workers (int): Processes used for chunking
+        embed_batch_size (int): Chunks per embedding call and per collection.add
+        queue_size (int): Batches each queue holds before the stage feeding it waits
+        indexed_ids (dict[str, set]): Chunk IDs already stored for each publication
 
     Returns:
-        None
-    """
-    next_id = collection.count()
-
-    for publication in publications:
-        chunked_publication = chunk_publication(publication)
-        embeddings = embed_documents(chunked_publication)
-        ids = list(range(next_id, next_id + len(chunked_publication)))
-        ids = [f"document_{id}" for id in ids]
-        collection.add(
-            embeddings=embeddings,
-            ids=ids,
-            documents=chunked_publication,
-        )
-        next_id += len(chunked_publication)
+        dict: Busy seconds and items per stage, plus the wall-clock total
+    """
+    started = time.perf_counter()
+    chunk_stats, embed_stats, write_stats = StageStats("chunk"), StageStats("embed"), StageStats("write")
+    to_embed = queue.Queue(maxsize=queue_size)
+    to_write = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    indexed_ids = indexed_ids or {}
+
+    def chunker():
+        batch = []
+        split = partial(chunk_publication_records, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                t0 = time.perf_counter()
+                for publication_id, records in zip(publications, pool.map(split, publications, publications.values(), chunksize=8)):
+                    chunk_stats.add(len(records), time.perf_counter() - t0)
+                    old_ids = indexed_ids.get(publication_id, set())
+                    kept = [r for r in records if r[0] in old_ids]
+                    if kept:
+                        to_write.put(("update", [r[0] for r in kept], [r[2] for r in kept]))
+                    stale = old_ids - {r[0] for r in records}
+                    if stale:
+                        to_write.put(("delete", list(stale)))
+                    for record in records:
+                        if record[0] in old_ids:
+                            continue
+                        batch.append(record)
+                        if len(batch) == embed_batch_size:
+                            to_embed.put(batch)
+                            batch = []
+                    t0 = time.perf_counter()
+            if batch:
+                to_embed.put(batch)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            to_embed.put(None)
+
+    def writer():
+        while (op := to_write.get()) is not None:
+            if errors:
+                continue  # keep draining so the other stages never block on a dead writer
+            t0 = time.perf_counter()
+            try:
+                if op[0] == "upsert":
+                    _, ids, documents, embeddings, metadatas = op
+                    collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+                elif op[0] == "update":
+                    _, ids, metadatas = op
+                    collection.update(ids=ids, metadatas=metadatas)
+                else:
+                    _, ids = op
+                    collection.delete(ids=ids)
+            except Exception as e:
+                errors.append(e)
+                continue
+            write_stats.add(len(ids), time.perf_counter() - t0)
 
+    threads = [threading.Thread(target=chunker, name="chunker"), threading.Thread(target=writer, name="writer")]
+    for thread in threads:
+        thread.start()
+    while (batch := to_embed.get()) is not None:
+        if errors:
+            continue  # drain so the chunker can finish
+        ids, documents, metadatas = [r[0] for r in batch], [r[1] for r in batch], [r[2] for r in batch]
+        t0 = time.perf_counter()
+        try:
+            embeddings = embed_documents(documents)
+        except Exception as e:
+            errors.append(e)
+            continue
+        embed_stats.add(len(documents), time.perf_counter() - t0)
+        to_write.put(("upsert", ids, documents, embeddings, metadatas))
+        print(f"Embedded {embed_stats.items} chunks.")
+    to_write.put(None)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
 
-def main():
+    wall_seconds = time.perf_counter() - started
+    stages = [chunk_stats, embed_stats, write_stats]
+    print_throughput_report(stages, wall_seconds, embed_stats.items)
+    if get_embedding_cache() is not None:
+        print(f"Embedding cache: {get_embedding_cache().stats()}")
+    return {
+        **{stage.name: {"items": stage.items, "busy_seconds": round(stage.busy_seconds, 3)} for stage in stages},
+        "wall_seconds": round(wall_seconds, 3),
+    }
+
+
+def sync_publications(
+    collection: chromadb.Collection, publication_dir: str = DATA_DIR, **ingestion_params
+) -> dict:
+    """
+    Bring the collection in line with the .md files in publication_dir.
+
+    Only new or changed publications are chunked and embedded; chunks of publications
+    that were deleted, and chunks written before publication ids existed, are removed.
+
+    Args:
+        collection (chromadb.Collection): The collection to update
+        publication_dir (str): Directory holding the publication markdown files
+        **ingestion_params: Passed to insert_publications_pipelined
+
+    Returns:
+        dict: The pipeline's throughput report plus publication counts
+    """
+    chunk_size = ingestion_params.get("chunk_size", 1000)
+    chunk_overlap = ingestion_params.get("chunk_overlap", 200)
+    publications = load_publications_by_id(publication_dir)
+    indexed = get_indexed_publications(collection)
+
+    changed = {
+        publication_id: publication
+        for publication_id, publication in publications.items()
+        if indexed.get(publication_id, {}).get("hash") != publication_hash(publication, chunk_size, chunk_overlap)
+    }
+    deleted = [publication_id for publication_id in indexed if publication_id not in publications]
+    print(
+        f"{len(publications) - len(changed)} unchanged, {len(changed)} new or changed, "
+        f"{len(deleted)} deleted publications."
+    )
+
+    stale_ids = [id for publication_id in deleted for id in indexed[publication_id]["ids"]]
+    for start in range(0, len(stale_ids), 10000):
+        collection.delete(ids=stale_ids[start:start + 10000])
+
+    report = insert_publications_pipelined(
+        collection,
+        changed,
+        indexed_ids={publication_id: indexed[publication_id]["ids"] for publication_id in changed if publication_id in indexed},
+        **ingestion_params,
+    )
+    return {
+        **report,
+        "publications_changed": len(changed),
+        "publications_deleted": len(deleted),
+        "chunks_deleted": len(stale_ids),
+    }
+
+
+def main(rebuild: bool = False):
+    ingestion_params = load_yaml_config(APP_CONFIG_FPATH)["ingestion"]
     collection = initialize_db(
         persist_directory=VECTOR_DB_DIR,
         collection_name="publications",
-        delete_existing=True,
+        delete_existing=rebuild,
     )
-    publications = load_all_publications()
-    insert_publications(collection, publications)
+    sync_publications(collection, **ingestion_params)
 
     print(f"Total documents in collection: {collection.count()}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index the publications in DATA_DIR.")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="delete the vector DB and index everything from scratch",
+    )
+    main(rebuild=parser.parse_args().rebuild)
@@ -6,6 +6,7 @@ from prompt_builder import build_prompt_from_config
 from langchain_groq import ChatGroq
 from paths import APP_CONFIG_FPATH, PROMPT_CONFIG_FPATH, OUTPUTS_DIR
 from vector_db_ingest import get_db_collection, embed_documents
+from embedding_registry import warmup
 
 
 logger = logging.getLogger()
@@ -131,6 +132,8 @@ def respond_to_query(
 
 if __name__ == "__main__":
     setup_logging()
+    logging.info("Loading embedding model...")
+    warmup()
     app_config = load_yaml_config(APP_CONFIG_FPATH)
     prompt_config = load_yaml_config(PROMPT_CONFIG_FPATH)
 